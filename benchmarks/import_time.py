@@ -0,0 +1,75 @@
+"""
+Measures how long common `sense_hat` imports take and checks that they don't
+pull in heavy dependencies before they are needed.
+
+Each statement is timed in a fresh interpreter (so nothing is already cached
+in `sys.modules`), and the median of several runs is reported. The script
+exits with a non-zero status if an import loads a module it shouldn't.
+
+    python benchmarks/import_time.py [--runs N]
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from statistics import median
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules which must not be loaded by merely importing the package
+HEAVY = (
+    'numpy', 'PIL', 'RTIMU', 'smbus', 'inspect', 'shutil', 'copy', 'logging')
+
+STATEMENTS = (
+    'import sense_hat',
+    'from sense_hat import SenseStick',
+    'from sense_hat.colour import ColourSensor',
+    'from sense_hat import SenseHat',
+)
+
+PROBE = '''
+import sys, time, json
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+loaded = sorted({{name.split('.')[0] for name in sys.modules}} & set({heavy!r}))
+print(json.dumps([elapsed, loaded]))
+'''
+
+
+def measure(statement, runs):
+    code = PROBE.format(statement=statement, heavy=HEAVY)
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    times = []
+    loaded = []
+    for _ in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, '-c', code], env=env, cwd=ROOT)
+        elapsed, loaded = json.loads(output.decode('ascii'))
+        times.append(elapsed)
+    return median(times), loaded
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=10,
+        help='number of interpreters to time each statement in')
+    options = parser.parse_args(args)
+
+    failed = False
+    for statement in STATEMENTS:
+        elapsed, loaded = measure(statement, options.runs)
+        print('%-45s %8.2f ms  %s' % (
+            statement, elapsed * 1000, ', '.join(loaded) or '-'))
+        if loaded:
+            failed = True
+    if failed:
+        print('Heavy modules were loaded at import time', file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
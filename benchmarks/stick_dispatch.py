@@ -0,0 +1,109 @@
+"""
+Measures the latency and throughput of joystick callback dispatch.
+
+Events are injected into a `FakeStickDevice`, so no Sense HAT is needed.
+Latency is the time from injecting a single event to its callback running,
+measured for events injected one at a time. Throughput is the number of
+events per second dispatched from a burst injected all at once.
+
+    python benchmarks/stick_dispatch.py [--events N] [--workers N]
+"""
+
+import os
+import sys
+import time
+import argparse
+from threading import Event
+from statistics import median
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sense_hat.stick import (
+    SenseStick,
+    FakeStickDevice,
+    InputEvent,
+    DIRECTION_UP,
+    DIRECTION_DOWN,
+    ACTION_PRESSED,
+    ACTION_RELEASED,
+    )
+
+
+def measure_latency(device, stick, samples):
+    received = Event()
+    latencies = []
+
+    def callback(event):
+        latencies.append(time.perf_counter() - sent)
+        received.set()
+
+    stick.direction_any = callback
+    try:
+        for _ in range(samples):
+            received.clear()
+            sent = time.perf_counter()
+            device.inject(DIRECTION_UP, ACTION_PRESSED)
+            if not received.wait(1):
+                raise RuntimeError('event was not dispatched')
+    finally:
+        stick.direction_any = None
+    latencies.sort()
+    return latencies
+
+
+def measure_throughput(device, stick, events):
+    done = Event()
+    count = [0]
+
+    def callback():
+        count[0] += 1
+        if count[0] == events:
+            done.set()
+
+    burst = [
+        InputEvent(
+            0, (DIRECTION_UP, DIRECTION_DOWN)[i % 2],
+            (ACTION_PRESSED, ACTION_RELEASED)[(i // 2) % 2])
+        for i in range(events)]
+    stick.direction_any = callback
+    try:
+        start = time.perf_counter()
+        device.inject_events(burst)
+        if not done.wait(60):
+            raise RuntimeError('only %d events were dispatched' % count[0])
+        return events / (time.perf_counter() - start)
+    finally:
+        stick.direction_any = None
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--events', type=int, default=10000,
+        help='number of events in the throughput burst')
+    parser.add_argument('--samples', type=int, default=1000,
+        help='number of events to measure the latency of')
+    parser.add_argument('--workers', type=int, default=0,
+        help='dispatch callbacks on a thread pool of this many workers '
+        '(default: in the callback thread)')
+    options = parser.parse_args(args)
+
+    with FakeStickDevice() as device:
+        stick = SenseStick(source=device)
+        if options.workers:
+            from concurrent.futures import ThreadPoolExecutor
+            stick.callback_executor = ThreadPoolExecutor(options.workers)
+        try:
+            latencies = measure_latency(device, stick, options.samples)
+            throughput = measure_throughput(device, stick, options.events)
+        finally:
+            stick.close()
+    print('latency    median %8.1f us  p99 %8.1f us  max %8.1f us' % (
+        median(latencies) * 1e6,
+        latencies[int(len(latencies) * 0.99)] * 1e6,
+        latencies[-1] * 1e6))
+    print('throughput %10.0f events/s' % throughput)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,16 +1,57 @@
-from __future__ import absolute_import
-from .sense_hat import SenseHat, SenseHat as AstroPi
-from .stick import (
-    SenseStick,
-    InputEvent,
-    DIRECTION_UP,
-    DIRECTION_DOWN,
-    DIRECTION_LEFT,
-    DIRECTION_RIGHT,
-    DIRECTION_MIDDLE,
-    ACTION_PRESSED,
-    ACTION_RELEASED,
-    ACTION_HELD,
-    )
-
-__version__ = '2.6.0'
+from __future__ import absolute_import
+import sys
+from .stick import (
+    SenseStick,
+    InputEvent,
+    DIRECTION_UP,
+    DIRECTION_DOWN,
+    DIRECTION_LEFT,
+    DIRECTION_RIGHT,
+    DIRECTION_MIDDLE,
+    ACTION_PRESSED,
+    ACTION_RELEASED,
+    ACTION_HELD,
+    )
+
+__version__ = '2.6.0'
+
+# Listed so that "from sense_hat import *" also binds the lazy names
+__all__ = [
+    'SenseHat',
+    'AstroPi',
+    'SenseStick',
+    'InputEvent',
+    'DIRECTION_UP',
+    'DIRECTION_DOWN',
+    'DIRECTION_LEFT',
+    'DIRECTION_RIGHT',
+    'DIRECTION_MIDDLE',
+    'ACTION_PRESSED',
+    'ACTION_RELEASED',
+    'ACTION_HELD',
+    ]
+
+# SenseHat is imported on first use so that programs which only need the
+# joystick or colour sensor don't pay for importing it. Python versions
+# without module __getattr__ (PEP 562) import it straight away
+_LAZY = {
+    'SenseHat': ('sense_hat', 'SenseHat'),
+    'AstroPi': ('sense_hat', 'SenseHat'),
+}
+
+if sys.version_info < (3, 7):
+    from .sense_hat import SenseHat, SenseHat as AstroPi
+else:
+    def __getattr__(name):
+        try:
+            module, attr = _LAZY[name]
+        except KeyError:
+            raise AttributeError(
+                'module %r has no attribute %r' % (__name__, name))
+        from importlib import import_module
+        value = getattr(import_module('.' + module, __name__), attr)
+        globals()[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(globals()) | set(_LAZY))
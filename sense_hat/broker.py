@@ -0,0 +1,669 @@
+"""
+Sharing the Sense HAT sensors between processes.
+
+Only one process can sensibly own the IMU, because RTIMU's sensor fusion
+depends on being fed every reading. The broker owns the sensors, samples
+them with a `Sampler` and publishes batches of samples over a Unix domain
+socket. Any number of processes can then use a `BrokerClient`, which has
+the same getters as `SenseHat`, without touching the I2C bus:
+
+    python -m sense_hat.broker
+
+    from sense_hat.broker import BrokerClient
+
+    with BrokerClient(streams=['imu', 'pressure']) as sense:
+        print(sense.get_pressure(), sense.get_orientation())
+
+A client subscribes by sending a line of comma-separated stream names (an
+empty line subscribes to every stream), and may send another line at any
+time to change its subscription. The broker replies with a `HEADER` of (0,
+`AVAILABLE`, a bit mask of the streams it samples, indexed by their
+position in `STREAM_ORDER`), then the latest sample of each newly
+subscribed stream. After that it sends, every batch interval, a frame for
+each subscribed stream that has new samples. A frame is a `HEADER` of
+(payload length, stream index, sample count) followed by that many
+records, each a little-endian float64 timestamp (as returned by
+`time.time`) and a float32 for each of the stream's fields in `STREAMS`.
+"""
+
+import os
+import sys
+import math
+import time
+import errno
+import socket
+import struct
+import logging
+import argparse
+import selectors
+from functools import partial
+from threading import Thread, Lock, Condition
+
+from .sampler import (
+    Sampler, STREAMS, add_rate_arguments, rates_from_arguments)
+
+
+STREAM_ORDER = ('imu', 'humidity', 'pressure', 'colour')
+HEADER = struct.Struct('<IBH')
+AVAILABLE = 0xFF
+RECORDS = {
+    stream: struct.Struct('<d%df' % len(STREAMS[stream]))
+    for stream in STREAM_ORDER
+}
+
+
+def default_path():
+    """
+    Returns the default path of the broker's socket: ``sense_hat.sock`` in
+    the user's runtime directory, or in the temporary directory if there is
+    none
+    """
+
+    directory = os.environ.get('XDG_RUNTIME_DIR')
+    if not directory:
+        import tempfile
+        directory = tempfile.gettempdir()
+    return os.path.join(directory, 'sense_hat.sock')
+
+
+class _Subscriber(object):
+    """
+    Internal. A connected client: its socket, the streams it subscribes to
+    and its unparsed input and unsent output
+    """
+
+    __slots__ = ('sock', 'streams', 'inbox', 'outbox')
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.streams = None
+        self.inbox = b''
+        self.outbox = bytearray()
+
+
+class Broker(object):
+    """
+    Publishes the samples taken by *sampler* (which the broker starts and
+    stops) on the Unix domain socket at *path*. Samples are sent to
+    subscribers in batches every *batch_interval* seconds. A subscriber
+    which falls more than *max_backlog* bytes behind is disconnected.
+
+    Call `start` to serve in a background thread, or `serve_forever`.
+    """
+
+    def __init__(
+            self, sampler, path=None, batch_interval=0.05,
+            max_backlog=1 << 20):
+        self._sampler = sampler
+        self._path = path or default_path()
+        self._batch_interval = batch_interval
+        self._max_backlog = max_backlog
+        self._pending = {stream: [] for stream in sampler.periods}
+        self._pending_lock = Lock()
+        self._subscribers = []
+        self._thread = None
+        self._stopping = False
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_w.setblocking(False)
+        for stream in self._pending:
+            sampler.add_listener(
+                partial(self._collect, stream), streams=[stream])
+
+    def close(self):
+        self.stop()
+        self._wake_r.close()
+        self._wake_w.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.close()
+
+    @property
+    def path(self):
+        """
+        The path of the broker's socket
+        """
+
+        return self._path
+
+    def start(self):
+        """
+        Starts the sampler and serves subscribers in a background thread
+        """
+
+        if not self._thread:
+            server = self._listen()
+            self._stopping = False
+            self._thread = Thread(target=self._serve, args=(server,))
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stops serving and sampling, disconnecting every subscriber. This
+        also stops `serve_forever` running in another thread
+        """
+
+        self._stopping = True
+        try:
+            self._wake_w.send(b'\0')
+        except OSError:
+            # Closed, or already full of wake-ups
+            pass
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def serve_forever(self):
+        """
+        Starts the sampler and serves subscribers until `stop` is called
+        from another thread
+        """
+
+        self._stopping = False
+        self._serve(self._listen())
+
+    def _listen(self):
+        """
+        Internal. Returns a listening socket bound to the broker's path,
+        replacing a stale socket left by a broker that has exited
+        """
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            try:
+                server.bind(self._path)
+            except OSError as e:
+                if e.errno != errno.EADDRINUSE:
+                    raise
+                probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                try:
+                    probe.connect(self._path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    os.unlink(self._path)
+                    server.bind(self._path)
+                else:
+                    raise OSError(
+                        errno.EADDRINUSE,
+                        'A broker is already listening on %s' % self._path)
+                finally:
+                    probe.close()
+            server.listen(16)
+            server.setblocking(False)
+        except:
+            server.close()
+            raise
+        return server
+
+    def _collect(self, stream, row):
+        """
+        Internal. Sampler listener which queues the record for *stream*
+        """
+
+        record = RECORDS[stream].pack(
+            row['timestamp'], *(row[field] for field in STREAMS[stream]))
+        with self._pending_lock:
+            self._pending[stream].append(record)
+
+    def _serve(self, server):
+        selector = selectors.DefaultSelector()
+        selector.register(server, selectors.EVENT_READ)
+        selector.register(self._wake_r, selectors.EVENT_READ)
+        self._sampler.start()
+        try:
+            next_batch = time.monotonic() + self._batch_interval
+            while not self._stopping:
+                timeout = max(0, next_batch - time.monotonic())
+                for key, events in selector.select(timeout):
+                    if key.fileobj is server:
+                        self._accept(selector, server)
+                    elif key.fileobj is self._wake_r:
+                        self._wake_r.recv(4096)
+                    else:
+                        subscriber = key.data
+                        if events & selectors.EVENT_READ:
+                            self._receive(selector, subscriber)
+                        if (events & selectors.EVENT_WRITE and
+                                subscriber in self._subscribers):
+                            self._send(selector, subscriber)
+                now = time.monotonic()
+                if now >= next_batch:
+                    self._publish(selector)
+                    next_batch += self._batch_interval
+                    if next_batch <= now:
+                        next_batch = now + self._batch_interval
+        finally:
+            self._sampler.stop()
+            for subscriber in list(self._subscribers):
+                self._drop(selector, subscriber)
+            selector.close()
+            server.close()
+            try:
+                os.unlink(self._path)
+            except OSError:
+                pass
+
+    def _accept(self, selector, server):
+        try:
+            sock, _ = server.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        subscriber = _Subscriber(sock)
+        self._subscribers.append(subscriber)
+        selector.register(sock, selectors.EVENT_READ, subscriber)
+
+    def _drop(self, selector, subscriber):
+        selector.unregister(subscriber.sock)
+        subscriber.sock.close()
+        self._subscribers.remove(subscriber)
+
+    def _receive(self, selector, subscriber):
+        """
+        Internal. Reads subscription lines from *subscriber*. A new
+        subscriber is immediately sent the latest sample of each of its
+        streams, so its getters don't have to wait for the next sample
+        """
+
+        try:
+            data = subscriber.sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._drop(selector, subscriber)
+            return
+        lines = (subscriber.inbox + data).split(b'\n')
+        subscriber.inbox = lines.pop()
+        if len(subscriber.inbox) > 4096:
+            self._drop(selector, subscriber)
+            return
+        for line in lines:
+            names = [
+                name.strip() for name in line.decode('ascii', 'replace')
+                .split(',') if name.strip()]
+            streams = set(names or self._pending) & set(self._pending)
+            added = streams - (subscriber.streams or set())
+            subscriber.streams = streams
+            subscriber.outbox += HEADER.pack(0, AVAILABLE, sum(
+                1 << index for index, stream in enumerate(STREAM_ORDER)
+                if stream in self._pending))
+            row = self._sampler.latest()
+            timestamps = self._sampler.timestamps()
+            for stream in STREAM_ORDER:
+                if stream in added and timestamps[stream]:
+                    record = RECORDS[stream].pack(
+                        timestamps[stream],
+                        *(row[field] for field in STREAMS[stream]))
+                    subscriber.outbox += self._frame(stream, [record])
+        self._send(selector, subscriber)
+
+    def _frame(self, stream, records):
+        payload = b''.join(records)
+        return HEADER.pack(
+            len(payload), STREAM_ORDER.index(stream), len(records)) + payload
+
+    def _publish(self, selector):
+        """
+        Internal. Sends each subscriber a frame for each of its streams with
+        samples queued since the last batch. Each frame is built once and
+        shared by every subscriber
+        """
+
+        with self._pending_lock:
+            pending = self._pending
+            self._pending = {stream: [] for stream in pending}
+        frames = {}
+        for stream, records in pending.items():
+            # The sample count in the header is 16 bits
+            for index in range(0, len(records), 0xFFFF):
+                frames[stream] = frames.get(stream, b'') + self._frame(
+                    stream, records[index:index + 0xFFFF])
+        if not frames:
+            return
+        for subscriber in list(self._subscribers):
+            if not subscriber.streams:
+                continue
+            for stream in STREAM_ORDER:
+                if stream in subscriber.streams and stream in frames:
+                    subscriber.outbox += frames[stream]
+            if len(subscriber.outbox) > self._max_backlog:
+                self._drop(selector, subscriber)
+            else:
+                self._send(selector, subscriber)
+
+    def _send(self, selector, subscriber):
+        """
+        Internal. Sends as much of *subscriber*'s output as its socket will
+        take, watching for it to become writable if some remains
+        """
+
+        if subscriber.outbox:
+            try:
+                sent = subscriber.sock.send(subscriber.outbox)
+            except BlockingIOError:
+                sent = 0
+            except OSError:
+                self._drop(selector, subscriber)
+                return
+            del subscriber.outbox[:sent]
+        events = selectors.EVENT_READ
+        if subscriber.outbox:
+            events |= selectors.EVENT_WRITE
+        if selector.get_key(subscriber.sock).events != events:
+            selector.modify(subscriber.sock, events, subscriber)
+
+
+class BrokerClient(object):
+    """
+    Receives samples of *streams* (by default, all of them) from the broker
+    listening at *path*, and provides the getters of `SenseHat` for them.
+
+    The getters' *max_age* and *timeout* arguments work as they do for
+    `SenseHat`, except that the default *max_age* of `None` returns the
+    latest sample received however old it is; a number waits for a sample
+    no more than *max_age* seconds old. The orientation getters which
+    reconfigure the IMU (`get_compass`, `get_gyroscope` and
+    `get_accelerometer`) are not available, as the broker owns the IMU.
+    """
+
+    def __init__(self, path=None, streams=None):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._sock.connect(path or default_path())
+            self._sock.sendall(','.join(streams or ()).encode('ascii') + b'\n')
+        except:
+            self._sock.close()
+            raise
+        self._streams = frozenset(streams) if streams else None
+        self._readings = {}
+        self._available = None
+        self._listeners = []
+        self._changed = Condition()
+        self._closed = False
+        self._thread = Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._thread.join()
+            self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.close()
+
+    @property
+    def connected(self):
+        """
+        Returns True while the client is receiving samples from the broker
+        """
+
+        return self._thread.is_alive()
+
+    def subscribe(self, streams=None):
+        """
+        Changes the streams received from the broker to *streams* (by
+        default, all of them)
+        """
+
+        self._sock.sendall(','.join(streams or ()).encode('ascii') + b'\n')
+        self._streams = frozenset(streams) if streams else None
+
+    def add_listener(self, listener, streams=None):
+        """
+        Arranges for *listener* to be called with a row, as produced by
+        `Sampler`, for each sample received. If *streams* is given,
+        *listener* is only called for samples of the named streams.
+        Listeners are called from the receiving thread, so they should
+        return quickly. Exceptions raised by listeners are logged.
+        """
+
+        if streams is not None:
+            streams = frozenset(streams)
+        self._listeners.append((listener, streams))
+
+    def remove_listener(self, listener):
+        """
+        Stops *listener* from being called with new samples
+        """
+
+        self._listeners = [
+            (fn, streams) for fn, streams in self._listeners
+            if fn != listener
+        ]
+
+    def _recv_exactly(self, size, buf):
+        view = memoryview(buf)[:size]
+        while view:
+            received = self._sock.recv_into(view)
+            if not received:
+                raise EOFError
+            view = view[received:]
+
+    def _run(self):
+        header = bytearray(HEADER.size)
+        row = {'timestamp': 0.0}
+        try:
+            while True:
+                self._recv_exactly(HEADER.size, header)
+                length, index, count = HEADER.unpack(header)
+                if index == AVAILABLE:
+                    with self._changed:
+                        self._available = frozenset(
+                            stream for bit, stream in enumerate(STREAM_ORDER)
+                            if count & (1 << bit))
+                        self._changed.notify_all()
+                    continue
+                payload = bytearray(length)
+                self._recv_exactly(length, payload)
+                stream = STREAM_ORDER[index]
+                records = list(RECORDS[stream].iter_unpack(payload))
+                with self._changed:
+                    self._readings[stream] = records[-1]
+                    self._changed.notify_all()
+                listeners = self._listeners
+                if listeners:
+                    fields = STREAMS[stream]
+                    for record in records:
+                        row['timestamp'] = record[0]
+                        row.update(zip(fields, record[1:]))
+                        for listener, streams in listeners:
+                            if streams is None or stream in streams:
+                                self._call_listener(listener, dict(row))
+        except (EOFError, OSError):
+            pass
+        finally:
+            with self._changed:
+                self._changed.notify_all()
+
+    def _call_listener(self, listener, row):
+        try:
+            listener(row)
+        except Exception:
+            # A failing listener mustn't stop samples being received, or
+            # be mistaken for the broker disconnecting
+            logging.exception('Broker client listener failed')
+
+    def _read(self, stream, max_age=None, timeout=None):
+        """
+        Internal. Returns the latest record of *stream*, waiting up to
+        *timeout* seconds for one no more than *max_age* seconds old if
+        *max_age* is given. Returns None if nothing has been received, or
+        *stream* isn't subscribed to or sampled by the broker
+        """
+
+        def fresh():
+            if not self._thread.is_alive():
+                return True
+            if self._streams is not None and stream not in self._streams:
+                return True
+            if self._available is None:
+                return False
+            if stream not in self._available:
+                return True
+            record = self._readings.get(stream)
+            if record is None:
+                return False
+            return max_age is None or time.time() - record[0] <= max_age
+
+        with self._changed:
+            self._changed.wait_for(fresh, timeout)
+            return self._readings.get(stream)
+
+    def _values(self, stream, start, stop, max_age, timeout):
+        record = self._read(stream, max_age, timeout)
+        if record is None:
+            return (0,) * (stop - start)
+        return record[1 + start:1 + stop]
+
+    def get_humidity(self, max_age=None, timeout=None):
+        return self._values('humidity', 0, 1, max_age, timeout)[0]
+
+    @property
+    def humidity(self):
+        return self.get_humidity()
+
+    def get_temperature_from_humidity(self, max_age=None, timeout=None):
+        return self._values('humidity', 1, 2, max_age, timeout)[0]
+
+    def get_temperature_from_pressure(self, max_age=None, timeout=None):
+        return self._values('pressure', 1, 2, max_age, timeout)[0]
+
+    def get_temperature(self, max_age=None, timeout=None):
+        return self.get_temperature_from_humidity(max_age, timeout)
+
+    @property
+    def temp(self):
+        return self.get_temperature()
+
+    @property
+    def temperature(self):
+        return self.get_temperature()
+
+    def get_pressure(self, max_age=None, timeout=None):
+        return self._values('pressure', 0, 1, max_age, timeout)[0]
+
+    @property
+    def pressure(self):
+        return self.get_pressure()
+
+    def get_environment(self, max_age=None, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        humidity = self._values('humidity', 0, 2, max_age, timeout)
+        if deadline is not None:
+            timeout = max(0, deadline - time.monotonic())
+        pressure = self._values('pressure', 0, 2, max_age, timeout)
+        return {
+            'humidity': humidity[0],
+            'temperature_from_humidity': humidity[1],
+            'pressure': pressure[0],
+            'temperature_from_pressure': pressure[1],
+        }
+
+    @property
+    def environment(self):
+        return self.get_environment()
+
+    def get_orientation_radians(self, max_age=None, timeout=None):
+        roll, pitch, yaw = self._values('imu', 0, 3, max_age, timeout)
+        return {'roll': roll, 'pitch': pitch, 'yaw': yaw}
+
+    @property
+    def orientation_radians(self):
+        return self.get_orientation_radians()
+
+    def get_orientation_degrees(self, max_age=None, timeout=None):
+        orientation = self.get_orientation_radians(max_age, timeout)
+        for key, val in orientation.items():
+            deg = math.degrees(val)  # Result is -180 to +180
+            orientation[key] = deg + 360 if deg < 0 else deg
+        return orientation
+
+    def get_orientation(self, max_age=None, timeout=None):
+        return self.get_orientation_degrees(max_age, timeout)
+
+    @property
+    def orientation(self):
+        return self.get_orientation_degrees()
+
+    def _get_xyz(self, start, max_age, timeout):
+        x, y, z = self._values('imu', start, start + 3, max_age, timeout)
+        return {'x': x, 'y': y, 'z': z}
+
+    def get_compass_raw(self, max_age=None, timeout=None):
+        return self._get_xyz(3, max_age, timeout)
+
+    @property
+    def compass_raw(self):
+        return self.get_compass_raw()
+
+    def get_gyroscope_raw(self, max_age=None, timeout=None):
+        return self._get_xyz(6, max_age, timeout)
+
+    @property
+    def gyro_raw(self):
+        return self.get_gyroscope_raw()
+
+    @property
+    def gyroscope_raw(self):
+        return self.get_gyroscope_raw()
+
+    def get_accelerometer_raw(self, max_age=None, timeout=None):
+        return self._get_xyz(9, max_age, timeout)
+
+    @property
+    def accel_raw(self):
+        return self.get_accelerometer_raw()
+
+    @property
+    def accelerometer_raw(self):
+        return self.get_accelerometer_raw()
+
+    def get_colour_raw(self, max_age=None, timeout=None):
+        return tuple(
+            int(value) for value in
+            self._values('colour', 0, 4, max_age, timeout))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m sense_hat.broker',
+        description='Share the Sense HAT sensors with other processes')
+    parser.add_argument('--path', default=default_path(),
+        help='path of the Unix domain socket (default: %(default)s)')
+    parser.add_argument('--batch-interval', type=float, default=0.05,
+        metavar='SECONDS',
+        help='how often samples are sent to subscribers '
+        '(default: %(default)s)')
+    add_rate_arguments(parser)
+    options = parser.parse_args(args)
+
+    from .sense_hat import SenseHat
+
+    with SenseHat() as sense:
+        sampler = Sampler(sense, rates_from_arguments(options, sense))
+        broker = Broker(sampler, options.path, options.batch_interval)
+        try:
+            broker.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            broker.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,9 +7,15 @@ The sense hat v2 uses the TCS3400 the successor of the TCS34725.
 The TCS34725 is not available any more. It was discontinued by ams in 2021.
 """
 
-from time import sleep
+import weakref
+from time import sleep, monotonic
+from threading import RLock
 from .exceptions import ColourSensorInitialisationError, InvalidGainError, \
     InvalidIntegrationCyclesError
+from .singleflight import SingleFlight
+from . import discovery
+from . import registry
+from . import hooks
 
 
 class HardwareInterface:
@@ -24,6 +30,10 @@ class HardwareInterface:
     files or even a hardware emulator.
     """
 
+    # The lock serialising access to the hardware, if the interface has one.
+    # ColourSensor holds it while reading, so it can give up on a timeout
+    _lock = None
+
     @staticmethod
     def max_value(integration_cycles):
         """
@@ -32,6 +42,20 @@ class HardwareInterface:
         """
         return 65535 if integration_cycles >= 64 else 1024*integration_cycles
 
+    def close(self):
+        """
+        Release any resources (e.g. a bus connection) held by the interface
+        """
+        pass
+
+    def invalidate(self):
+        """
+        Discard any settings the interface has cached, so they are read from
+        the hardware again. Call this if something else (e.g. another
+        process) may have changed them.
+        """
+        pass
+
     def get_enabled(self):
         """
         Return True if the sensor is enabled and False otherwise
@@ -124,7 +148,8 @@ def _raw_wrapper(register):
     fashion. This is a factory function that implements this retrieval method.
     """
     def get_raw_register(self):
-        block = self.bus.read_i2c_block_data(self.ADDR, register, 2)
+        with self._lock:
+            block = self.bus.read_i2c_block_data(self.ADDR, register, 2)
         return (block[0] + (block[1] << 8))
     return get_raw_register
 
@@ -153,6 +178,11 @@ class I2C(HardwareInterface):
     GDATA = 0x98
     BDATA = 0x9A
 
+    # control registers shadowed by the interface; the sensor only changes
+    # them when told to, so they are read from the hardware once and then
+    # kept up to date as they are written
+    CACHED = (ENABLE, ATIME, CONTROL)
+
     # bit positions
     OFF = 0x00
     PON = 0x01
@@ -172,7 +202,9 @@ class I2C(HardwareInterface):
     def __init__(self):
 
         import smbus
-        import glob
+
+        # Serialises access to the sensor across threads
+        self._lock = RLock()
 
         try:
             self.bus = smbus.SMBus(self.BUS)
@@ -180,78 +212,138 @@ class I2C(HardwareInterface):
             explanation = "(I2C is not enabled)" if not self.i2c_enabled() else ""
             raise ColourSensorInitialisationError(explanation=explanation) from e
 
-        # Test for sensor at I2C addresses 0x29 or 0x39
-        # Both sensors have variants at 0x29 and 0x39 (See data sheets)
-        addr1 = addr2 = False
-        try:
-            self.bus.write_quick(0x29)
-            addr1 = True
-        except:
-            pass
-        try:
-            self.bus.write_quick(0x39)
-            addr2 = True
-        except:
-            pass
-
-        if addr2:
-            self.ADDR = 0x39
-        if addr1 or addr2:
-            # get sensor id
-            id = self._read(self.ID)
-            if (id & 0xf8) == 0x90:
-                sensor = 'TCS340x'
-            elif (id & 0xf4) == 0x44:
-                sensor = 'TCS3472x'
-        else:
+        # Probing the bus is slow, so the address and type of the sensor are
+        # cached until the next reboot
+        found = discovery.lookup('colour', self._probe, self._verify)
+        if found is None:
             explanation = "(Sensor not present)"
             raise ColourSensorInitialisationError(explanation=explanation)
+        self.ADDR, sensor = found
+        self._device = 'i2c-%d:0x%02x' % (self.BUS, self.ADDR)
 
         # Set type specific constants
-        # Assume TCS3472x as in AstroPi
-        sensor == 'TCS3472x'
         if sensor == 'TCS340x':
             self.GAIN_VALUES = (1, 4, 16, 64)
             self.CLOCK_STEP = 0.00275 # 2.75ms
             self.GAIN_TO_REG = dict(zip(self.GAIN_VALUES, self.GAIN_REG_VALUES))
             self.REG_TO_GAIN = dict(zip(self.GAIN_REG_VALUES, self.GAIN_VALUES))
 
+        self._registers = {}
+        self._load_registers()
+
+    def _load_registers(self):
+        """
+        Populate the shadow of the control registers with a single block
+        read covering all of them.
+        """
+        first = min(self.CACHED)
+        with self._lock:
+            block = self.bus.read_i2c_block_data(
+                self.ADDR, first, max(self.CACHED) - first + 1)
+            self._registers = {
+                register: block[register - first] for register in self.CACHED}
+
+    def invalidate(self):
+        """
+        Discard the shadow of the control registers, so each is read from the
+        sensor the next time it is needed.
+        """
+        with self._lock:
+            self._registers = {}
+
+    def _identify(self, addr):
+        """
+        Read the ID register of the sensor at `addr` and return the sensor
+        type.
+        """
+        id = self.bus.read_byte_data(addr, self.ID)
+        if (id & 0xf8) == 0x90:
+            return 'TCS340x'
+        # Assume TCS3472x as in AstroPi
+        return 'TCS3472x'
+
+    def _probe(self):
+        """
+        Search the bus for the sensor and return a list of its address and
+        type, or None if it is not present.
+        """
+        # Test for sensor at I2C addresses 0x29 or 0x39
+        # Both sensors have variants at 0x29 and 0x39 (See data sheets)
+        addr = None
+        for candidate in (0x29, 0x39):
+            try:
+                self.bus.write_quick(candidate)
+                addr = candidate
+            except:
+                pass
+        if addr is None:
+            return None
+        return [addr, self._identify(addr)]
+
+    def _verify(self, found):
+        """
+        Return True if the sensor found by an earlier `_probe` is still there.
+        """
+        addr, sensor = found
+        return self._identify(addr) == sensor
+
     @staticmethod
     def i2c_enabled():
         """Returns True if I2C is enabled or False otherwise."""
+        import glob
         return next(glob.iglob('/sys/bus/i2c/devices/*'), None) is not None
 
+    def close(self):
+        """
+        Close the connection to the I2C bus
+        """
+        self.bus.close()
+
     def _read(self, attribute):
         """
         Read and return the value of a specific register (`attribute`) of the
-        TCS34725/TCS3400 colour sensor.
-        """
-        return self.bus.read_byte_data(self.ADDR, attribute)
-    
+        TCS34725/TCS3400 colour sensor. Control registers are returned from
+        their shadow when it holds them.
+        """
+        with self._lock:
+            try:
+                return self._registers[attribute]
+            except KeyError:
+                value = self.bus.read_byte_data(self.ADDR, attribute)
+                if attribute in self.CACHED:
+                    self._registers[attribute] = value
+                return value
+
     def _write(self, attribute, value):
         """
         Write a value in a specific register (`attribute`) of the
-        TCS34725/TCS3400 colour sensor.
+        TCS34725/TCS3400 colour sensor, updating its shadow.
         """
-        self.bus.write_byte_data(self.ADDR, attribute, value)
+        with self._lock:
+            # If the write fails the register's value is unknown
+            self._registers.pop(attribute, None)
+            self.bus.write_byte_data(self.ADDR, attribute, value)
+            if attribute in self.CACHED:
+                self._registers[attribute] = value
 
     def get_enabled(self):
         """
         Return True if the sensor is enabled and False otherwise
         """
-        return self._read(self.ENABLE) == (PON | AEN)
+        return (self._read(self.ENABLE) & self.ON) == self.ON
 
     def set_enabled(self, status):
         """
         Enable or disable the sensor, depending on the boolean `status` flag
         """
-        if status:
-            self._write(self.ENABLE, self.PON)
-            sleep(self.CLOCK_STEP) # From datasheet: "there is a 2.4 ms warm-up delay if PON is enabled."
-            self._write(self.ENABLE, self.ON)
-        else:
-            self._write(self.ENABLE, self.OFF)
-        sleep(self.CLOCK_STEP)
+        with self._lock:
+            if status:
+                self._write(self.ENABLE, self.PON)
+                sleep(self.CLOCK_STEP) # From datasheet: "there is a 2.4 ms warm-up delay if PON is enabled."
+                self._write(self.ENABLE, self.ON)
+            else:
+                self._write(self.ENABLE, self.OFF)
+            sleep(self.CLOCK_STEP)
 
     def get_gain(self):
         """
@@ -294,7 +386,10 @@ class I2C(HardwareInterface):
         integration cycles and can be computed using `max_value`.
         """
         # The 4-tuple is retrieved using a *single read*.
-        block = self.bus.read_i2c_block_data(self.ADDR, self.CDATA, 8)
+        with self._lock:
+            start = hooks.begin('colour_read', self._device, 8)
+            block = self.bus.read_i2c_block_data(self.ADDR, self.CDATA, 8)
+            hooks.end('colour_read', self._device, 8, start)
         return (
             (block[3] << 8) + block[2],
             (block[5] << 8) + block[4],
@@ -319,11 +414,40 @@ class I2C(HardwareInterface):
 class ColourSensor:
     
     def __init__(self, gain=1, integration_cycles=1, interface=I2C):
-        self.interface = interface()
+        # Every ColourSensor in the process using the same kind of interface
+        # shares one instance of it
+        key = ('colour', interface)
+        self.interface = registry.acquire(
+            key, interface, lambda interface: interface.close())
+        self._release = weakref.finalize(self, registry.release, key)
+        self._reads = SingleFlight()
+        self._reading = None  # The last (time, raw values) pair
         self.gain = gain
         self.integration_cycles = integration_cycles
         self.enabled = 1
 
+    def close(self):
+        """
+        Release the hardware interface, closing it if no other ColourSensor
+        is using it. The object must not be used afterwards.
+        """
+        self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.close()
+
+    def invalidate(self):
+        """
+        Discard the sensor settings cached by the interface, and the last
+        reading, so they are read from the sensor again. Call this if another
+        process may have changed the sensor's settings.
+        """
+        self.interface.invalidate()
+        self._reading = None
+
     @property
     def enabled(self):
         return self.interface.get_enabled()
@@ -340,6 +464,7 @@ class ColourSensor:
     def gain(self, gain):
         if gain in self.interface.GAIN_VALUES:
             self.interface.set_gain(gain)
+            self._reading = None  # Readings at the old gain are stale
         else:
             raise InvalidGainError(gain=gain, values=self.interface.GAIN_VALUES)
 
@@ -351,6 +476,7 @@ class ColourSensor:
     def integration_cycles(self, integration_cycles):
         if 1 <= integration_cycles <= 256:
             self.interface.set_integration_cycles(integration_cycles)
+            self._reading = None
             sleep(self.interface.CLOCK_STEP)
         else:
             raise InvalidIntegrationCyclesError(integration_cycles=integration_cycles)
@@ -363,9 +489,50 @@ class ColourSensor:
     def max_raw(self):
         return self.interface.max_value(self.integration_cycles)
 
+    def get_colour_raw(self, max_age=0, timeout=None):
+        """
+        Return the raw (red, green, blue, clear) readings. If the last
+        reading is no more than *max_age* seconds old it is returned without
+        reading the sensor. If the sensor cannot be read within *timeout*
+        seconds (e.g. because another thread is using it), the last reading
+        is returned.
+        """
+        reading = self._reading
+        if max_age and reading and monotonic() - reading[0] <= max_age:
+            return reading[1]
+        deadline = None if timeout is None else monotonic() + timeout
+        # Threads reading at the same time share a single block read
+        try:
+            return self._reads.do(
+                'raw', self._read_raw, deadline, timeout=timeout)
+        except TimeoutError:
+            reading = self._reading
+            return reading[1] if reading else (0, 0, 0, 0)
+
+    def _read_raw(self, deadline=None):
+        lock = self.interface._lock
+        if lock is None:
+            raw = self.interface.get_raw()
+        else:
+            if deadline is None:
+                acquired = lock.acquire()
+            else:
+                acquired = lock.acquire(
+                    timeout=max(0, deadline - monotonic()))
+            if not acquired:
+                raise TimeoutError('Timed out waiting for the colour sensor')
+            try:
+                raw = self.interface.get_raw()
+            finally:
+                lock.release()
+        self._reading = (monotonic(), raw)
+        return raw
+
+    get_color_raw = get_colour_raw
+
     @property
     def colour_raw(self):
-        return self.interface.get_raw()
+        return self.get_colour_raw()
 
     color_raw = colour_raw
     red_raw = property(lambda self: self.interface.get_red())
@@ -380,11 +547,12 @@ class ColourSensor:
     
     @property
     def colour(self):
-        return tuple(reading // self._scaling for reading in self.colour_raw)
+        scaling = self._scaling
+        return tuple(reading // scaling for reading in self.colour_raw)
 
     @property
     def rgb(self):
-        return tuple(reading // self._scaling for reading in self.colour_raw)[0:3]
+        return self.colour[0:3]
 
     color = colour
     red = property(lambda self: self.red_raw // self._scaling )
@@ -0,0 +1,368 @@
+"""
+Long-term logging of sensor streams to disk.
+
+A `DataLogger` writes each stream to a series of chunk files in the NumPy
+``.npy`` format: a structured array with a float64 'timestamp' (as returned
+by `time.time`) and a float64 for each of the stream's fields in `STREAMS`.
+Records are buffered in memory and written by a background thread in large
+blocks, so sampling never waits for the disk, and `fsync` is called only
+occasionally to limit wear on SD cards:
+
+    from sense_hat import SenseHat
+    from sense_hat.sampler import Sampler
+    from sense_hat.datalog import DataLogger
+
+    sense = SenseHat()
+    with DataLogger('/home/pi/log', ['imu', 'pressure']) as logger, \\
+            Sampler(sense) as sampler:
+        logger.attach(sampler)
+        ...
+
+The chunk being written is named ``STREAM-TIME.npy.part``; its header is
+completed and it is renamed to ``STREAM-TIME.npy`` (and optionally
+compressed to ``STREAM-TIME.npy.gz``) when it reaches *max_chunk_bytes* or
+*max_chunk_seconds*, or the logger is closed. Chunks left incomplete by a
+crash are completed the next time a logger is opened on the directory.
+Finished chunks can be read with `chunks` and `load`, which memory-maps
+uncompressed chunks.
+"""
+
+import os
+import re
+import time
+import errno
+import struct
+import logging
+from functools import partial
+from threading import Thread, Condition
+
+from .sampler import STREAMS
+
+
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+# Header length (including magic and length field) reserved in every
+# chunk, so the record count can be filled in without moving the data
+HEADER_SIZE = 512
+PART_SUFFIX = '.part'
+_CHUNK_NAME = re.compile(r'^(?P<stream>[a-z]+)-(?P<time>\d{8}T\d{6}Z(-\d+)?)'
+                         r'\.npy(?P<gz>\.gz)?$')
+
+
+def _record_struct(stream):
+    return struct.Struct('<d%dd' % len(STREAMS[stream]))
+
+
+def _npy_header(stream, count):
+    """
+    Internal. Returns the .npy header for *count* records of *stream*,
+    padded to `HEADER_SIZE` bytes
+    """
+
+    descr = [('timestamp', '<f8')] + [
+        (field, '<f8') for field in STREAMS[stream]]
+    header = repr({
+        'descr': descr, 'fortran_order': False, 'shape': (count,)})
+    header = header.encode('latin1')
+    padding = HEADER_SIZE - len(NPY_MAGIC) - 2 - len(header) - 1
+    if padding < 0:
+        raise ValueError('Header for %s is too long' % stream)
+    return (NPY_MAGIC + struct.pack('<H', HEADER_SIZE - len(NPY_MAGIC) - 2) +
+            header + b' ' * padding + b'\n')
+
+
+def _fsync_directory(directory):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _compress(path):
+    """
+    Internal. Replaces the finished chunk *path* with a gzip-compressed copy
+    """
+
+    import gzip
+    import shutil
+
+    temp_path = path + '.gz' + PART_SUFFIX
+    with open(path, 'rb') as source, gzip.open(temp_path, 'wb') as target:
+        shutil.copyfileobj(source, target, 1 << 20)
+    with open(temp_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.rename(temp_path, path + '.gz')
+    os.unlink(path)
+
+
+def recover(path):
+    """
+    Completes the header of the unfinished chunk *path* (a ``.part`` file)
+    to cover the whole records it holds and renames it to its finished name,
+    which is returned. A partly-written final record is discarded.
+    """
+
+    name = os.path.basename(path)
+    if not name.endswith(PART_SUFFIX):
+        raise ValueError('%s is not an unfinished chunk' % path)
+    finished = path[:-len(PART_SUFFIX)]
+    if finished.endswith('.gz'):
+        # Compression was interrupted; the uncompressed chunk still exists
+        os.unlink(path)
+        return finished[:-len('.gz')]
+    match = _CHUNK_NAME.match(os.path.basename(finished))
+    if not match:
+        raise ValueError('%s is not a chunk' % path)
+    stream = match.group('stream')
+    size = _record_struct(stream).size
+    fd = os.open(path, os.O_RDWR)
+    try:
+        length = os.fstat(fd).st_size
+        count = max(0, length - HEADER_SIZE) // size
+        os.ftruncate(fd, HEADER_SIZE + count * size)
+        os.pwrite(fd, _npy_header(stream, count), 0)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.rename(path, finished)
+    return finished
+
+
+class _Chunk(object):
+    """
+    Internal. The chunk file being written for a stream
+    """
+
+    def __init__(self, directory, stream, timestamp):
+        name = '%s-%s' % (
+            stream, time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(timestamp)))
+        suffix = ''
+        attempt = 0
+        while True:
+            self.path = os.path.join(
+                directory, '%s%s.npy%s' % (name, suffix, PART_SUFFIX))
+            try:
+                self.fd = os.open(
+                    self.path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+                attempt += 1
+                suffix = '-%d' % attempt
+            else:
+                break
+        self.stream = stream
+        self.count = 0
+        self.size = HEADER_SIZE
+        self.started = time.monotonic()
+        os.write(self.fd, _npy_header(stream, 0))
+
+    def finish(self):
+        """
+        Completes the chunk's header and renames it, returning its finished
+        path
+        """
+
+        os.pwrite(self.fd, _npy_header(self.stream, self.count), 0)
+        os.fsync(self.fd)
+        os.close(self.fd)
+        finished = self.path[:-len(PART_SUFFIX)]
+        os.rename(self.path, finished)
+        return finished
+
+
+class DataLogger(object):
+    """
+    Logs *streams* (a list of stream names) to chunk files in *directory*.
+
+    Records are written to disk once *buffer_size* bytes have accumulated
+    or *flush_interval* seconds have passed, and synced with `fsync` every
+    *fsync_interval* seconds, so at most that many seconds of data can be
+    lost in a power cut. A new chunk is started once the current one holds
+    *max_chunk_bytes* bytes or *max_chunk_seconds* seconds of data. If
+    *compress* is True, finished chunks are compressed with gzip.
+
+    Only one logger may write to a directory at a time, as a new logger
+    completes any unfinished chunks it finds there.
+    """
+
+    def __init__(
+            self, directory, streams, buffer_size=1 << 16, flush_interval=5,
+            fsync_interval=60, max_chunk_bytes=1 << 26,
+            max_chunk_seconds=3600, compress=False):
+        for stream in streams:
+            if stream not in STREAMS:
+                raise ValueError('Unknown stream %r' % stream)
+        self._directory = directory
+        self._structs = {stream: _record_struct(stream) for stream in streams}
+        self._buffer_size = buffer_size
+        self._flush_interval = flush_interval
+        self._fsync_interval = fsync_interval
+        self._max_chunk_bytes = max_chunk_bytes
+        self._max_chunk_seconds = max_chunk_seconds
+        self._compress = compress
+        self._buffers = {stream: bytearray() for stream in streams}
+        self._buffered = 0
+        self._chunks = {}
+        self._changed = Condition()
+        self._closing = False
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        for name in os.listdir(directory):
+            if name.endswith(PART_SUFFIX):
+                finished = recover(os.path.join(directory, name))
+                if compress and not finished.endswith('.gz'):
+                    _compress(finished)
+        self._thread = Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def close(self):
+        """
+        Writes all buffered records and finishes the current chunks
+        """
+
+        if self._thread:
+            with self._changed:
+                self._closing = True
+                self._changed.notify()
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.close()
+
+    def attach(self, sampler):
+        """
+        Logs the samples taken by *sampler* of the logger's streams
+        """
+
+        for stream in self._structs:
+            sampler.add_listener(partial(self._log_row, stream), [stream])
+
+    def _log_row(self, stream, row):
+        self.write(
+            stream, row['timestamp'], [row[field] for field in STREAMS[stream]])
+
+    def write(self, stream, timestamp, values):
+        """
+        Logs a record of *values* (one for each of *stream*'s fields) taken
+        at *timestamp*
+        """
+
+        record = self._structs[stream].pack(timestamp, *values)
+        with self._changed:
+            self._buffers[stream] += record
+            self._buffered += len(record)
+            if self._buffered >= self._buffer_size:
+                self._changed.notify()
+
+    def _run(self):
+        last_sync = time.monotonic()
+        closing = False
+        while not closing:
+            with self._changed:
+                self._changed.wait_for(
+                    lambda: self._closing or
+                    self._buffered >= self._buffer_size,
+                    self._flush_interval)
+                closing = self._closing
+                buffers = self._buffers
+                self._buffers = {stream: bytearray() for stream in buffers}
+                self._buffered = 0
+            try:
+                self._flush(buffers)
+                now = time.monotonic()
+                if closing:
+                    self._finish_all()
+                elif now - last_sync >= self._fsync_interval:
+                    for chunk in self._chunks.values():
+                        os.fsync(chunk.fd)
+                    last_sync = now
+            except OSError as e:
+                # Keep going; the disk may only be full for a while
+                logging.error('Failed to write sensor log: %s', e)
+
+    def _flush(self, buffers):
+        """
+        Internal. Appends the buffered records to each stream's chunk,
+        starting a new chunk first if the current one is full. A stream's
+        records are lost if they cannot all be written
+        """
+
+        for stream, data in buffers.items():
+            if not data:
+                continue
+            chunk = self._chunks.get(stream)
+            if chunk is not None and (
+                    chunk.size + len(data) > self._max_chunk_bytes or
+                    time.monotonic() - chunk.started >=
+                    self._max_chunk_seconds):
+                self._finish(stream)
+                chunk = None
+            if chunk is None:
+                timestamp = self._structs[stream].unpack_from(data)[0]
+                chunk = self._chunks[stream] = _Chunk(
+                    self._directory, stream, timestamp)
+            view = memoryview(data)
+            try:
+                while view:
+                    written = os.write(chunk.fd, view)
+                    view = view[written:]
+            except OSError:
+                # Drop the part of the batch that was written, so the chunk
+                # still ends on a record boundary, or finish the chunk if
+                # even that fails
+                try:
+                    os.ftruncate(chunk.fd, chunk.size)
+                    os.lseek(chunk.fd, chunk.size, os.SEEK_SET)
+                except OSError:
+                    self._finish(stream)
+                raise
+            chunk.size += len(data)
+            chunk.count += len(data) // self._structs[stream].size
+
+    def _finish(self, stream):
+        finished = self._chunks.pop(stream).finish()
+        _fsync_directory(self._directory)
+        if self._compress:
+            _compress(finished)
+
+    def _finish_all(self):
+        for stream in list(self._chunks):
+            self._finish(stream)
+
+
+def chunks(directory, stream=None):
+    """
+    Returns the paths of the finished chunks in *directory* (only those of
+    *stream*, if it is given) in the order they were written
+    """
+
+    found = []
+    for name in os.listdir(directory):
+        match = _CHUNK_NAME.match(name)
+        if match and (stream is None or match.group('stream') == stream):
+            found.append((match.group('time'), name))
+    return [os.path.join(directory, name) for _, name in sorted(found)]
+
+
+def load(path):
+    """
+    Returns the records in the chunk *path* as a NumPy structured array.
+    Uncompressed chunks are memory-mapped rather than read into memory
+    """
+
+    import numpy as np
+
+    if path.endswith('.gz'):
+        import gzip
+        with gzip.open(path, 'rb') as f:
+            return np.load(f)
+    return np.load(path, mmap_mode='r')
@@ -0,0 +1,152 @@
+"""
+Persistent cache of discovered Sense HAT hardware.
+
+Finding the framebuffer and joystick devices means scanning sysfs, and
+finding the colour sensor means probing the I2C bus. The results can only
+change across a reboot, so they are stored in ``~/.config/sense_hat`` along
+with the kernel's boot ID. A cached entry is used only if it was stored
+during the current boot and passes a cheap check that it still refers to the
+right device; otherwise the hardware is discovered again and the cache
+updated.
+"""
+
+import os
+import io
+import pwd
+import json
+import errno
+from threading import Lock
+
+
+SETTINGS_HOME_PATH = '.config/sense_hat'
+CACHE_FILE = 'devices.json'
+BOOT_ID_FILE = '/proc/sys/kernel/random/boot_id'
+
+_lock = Lock()
+_cache = None
+
+
+def _boot_id():
+    try:
+        with io.open(BOOT_ID_FILE, 'r') as f:
+            return f.read().strip()
+    except IOError:
+        return None
+
+
+def _cache_path():
+    home_dir = pwd.getpwuid(os.getuid())[5]
+    return os.path.join(home_dir, SETTINGS_HOME_PATH, CACHE_FILE)
+
+
+def _load():
+    """
+    Internal. Returns the cached devices for the current boot, or an empty
+    dictionary if there are none
+    """
+
+    boot_id = _boot_id()
+    if boot_id is None:
+        return {}
+    try:
+        with io.open(_cache_path(), 'r') as f:
+            data = json.load(f)
+    except (IOError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get('boot_id') != boot_id:
+        return {}
+    devices = data.get('devices')
+    return devices if isinstance(devices, dict) else {}
+
+
+def _save(devices):
+    """
+    Internal. Writes *devices* to the cache file. The file is replaced
+    atomically so concurrent processes never see a partial write. Failure
+    to write (e.g. a read-only home directory) is ignored; the cache is only
+    an optimisation
+    """
+
+    boot_id = _boot_id()
+    if boot_id is None:
+        return
+    path = _cache_path()
+    temp_path = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        try:
+            os.makedirs(os.path.dirname(path))
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        with io.open(temp_path, 'w') as f:
+            f.write(json.dumps({'boot_id': boot_id, 'devices': devices}))
+        os.rename(temp_path, path)
+    except (IOError, OSError):
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+
+
+def lookup(key, discover, validate):
+    """
+    Returns the cached value for *key* if *validate* returns True for it.
+    Otherwise calls *discover* and caches the value it returns, unless it is
+    `None`. Values must be JSON-serialisable.
+    """
+
+    global _cache
+
+    with _lock:
+        if _cache is None:
+            _cache = _load()
+        value = _cache.get(key)
+    if value is not None:
+        try:
+            if validate(value):
+                return value
+        except Exception:
+            pass
+    value = discover()
+    with _lock:
+        if value is None:
+            changed = _cache.pop(key, None) is not None
+        else:
+            changed = _cache.get(key) != value
+            _cache[key] = value
+        if changed:
+            _save(_cache)
+    return value
+
+
+def forget(key=None):
+    """
+    Removes *key* (or every entry, if *key* is `None`) from the cache, so
+    the next lookup discovers the hardware again
+    """
+
+    global _cache
+
+    with _lock:
+        if _cache is None:
+            _cache = _load()
+        if key is None:
+            _cache.clear()
+        else:
+            _cache.pop(key, None)
+        _save(_cache)
+
+
+def read_name(path):
+    """
+    Returns the stripped contents of the sysfs name file *path*, or `None`
+    if it does not exist
+    """
+
+    try:
+        with io.open(path, 'r') as f:
+            return f.read().strip()
+    except IOError as e:
+        if e.errno != errno.ENOENT:
+            raise
+        return None
@@ -0,0 +1,184 @@
+"""
+A local OpenMetrics exporter for the Sense HAT sensors.
+
+Run with:
+
+    python -m sense_hat.exporter [--port 9217]
+
+The sensors are read by a background `Sampler` at their configured rates.
+Scrapes are answered from the sampler's latest readings and never touch the
+I2C bus, however many scrapers there are or however often they scrape.
+"""
+
+import sys
+import argparse
+from threading import Lock
+
+from .sampler import (
+    Sampler, STREAMS, add_rate_arguments, rates_from_arguments)
+
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+# (metric name, unit, help, [(labels, field), ...]) for each stream
+METRICS = {
+    'humidity': (
+        ('sense_hat_humidity_percent', 'percent',
+            'Relative humidity',
+            [('', 'humidity')]),
+        ('sense_hat_temperature_celsius', 'celsius',
+            'Temperature',
+            [('sensor="humidity"', 'temperature_from_humidity')]),
+    ),
+    'pressure': (
+        ('sense_hat_pressure_millibars', 'millibars',
+            'Barometric pressure',
+            [('', 'pressure')]),
+        ('sense_hat_temperature_celsius', 'celsius',
+            'Temperature',
+            [('sensor="pressure"', 'temperature_from_pressure')]),
+    ),
+    'imu': (
+        ('sense_hat_orientation_radians', 'radians',
+            'Orientation from sensor fusion',
+            [('axis="%s"' % axis, axis) for axis in ('roll', 'pitch', 'yaw')]),
+        ('sense_hat_magnetometer_microteslas', 'microteslas',
+            'Raw magnetometer reading',
+            [('axis="%s"' % axis, 'compass_' + axis) for axis in 'xyz']),
+        ('sense_hat_gyroscope_radians_per_second', 'radians_per_second',
+            'Raw gyroscope reading',
+            [('axis="%s"' % axis, 'gyro_' + axis) for axis in 'xyz']),
+        ('sense_hat_accelerometer_gs', 'gs',
+            'Raw accelerometer reading',
+            [('axis="%s"' % axis, 'accel_' + axis) for axis in 'xyz']),
+    ),
+    'colour': (
+        ('sense_hat_colour_raw', None,
+            'Raw colour sensor reading',
+            [('channel="%s"' % channel, channel)
+             for channel in ('red', 'green', 'blue', 'clear')]),
+    ),
+}
+
+
+class Exporter(object):
+    """
+    Renders the latest readings of *sampler* in the OpenMetrics text format.
+    The rendered text is cached until the sampler produces a new row.
+    """
+
+    def __init__(self, sampler):
+        self._sampler = sampler
+        self._lock = Lock()
+        self._rendered = None
+        self._rendered_at = None
+
+    def render(self):
+        """
+        Returns the OpenMetrics exposition of the latest readings as bytes
+        """
+
+        row = self._sampler.latest()
+        with self._lock:
+            if row['timestamp'] != self._rendered_at:
+                timestamps = self._sampler.timestamps()
+                self._rendered = self._format(row, timestamps).encode('utf-8')
+                self._rendered_at = row['timestamp']
+            return self._rendered
+
+    def _format(self, row, timestamps):
+        families = {}
+        order = []
+        for stream in STREAMS:
+            if stream not in timestamps:
+                continue
+            # Don't report zeros for a stream which hasn't been read yet
+            if timestamps[stream]:
+                for name, unit, help, samples in METRICS[stream]:
+                    if name not in families:
+                        families[name] = (unit, help, [])
+                        order.append(name)
+                    families[name][2].extend(
+                        (labels, row[field]) for labels, field in samples)
+        lines = []
+        for name in order:
+            unit, help, samples = families[name]
+            lines.append('# TYPE %s gauge' % name)
+            if unit:
+                lines.append('# UNIT %s %s' % (name, unit))
+            lines.append('# HELP %s %s' % (name, help))
+            for labels, value in samples:
+                lines.append('%s%s %r' % (
+                    name, '{%s}' % labels if labels else '', float(value)))
+        name = 'sense_hat_last_sample_timestamp_seconds'
+        lines.append('# TYPE %s gauge' % name)
+        lines.append('# UNIT %s seconds' % name)
+        lines.append('# HELP %s Time each sensor was last read' % name)
+        for stream, timestamp in sorted(timestamps.items()):
+            lines.append('%s{stream="%s"} %r' % (name, stream, timestamp))
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+def _handler(exporter):
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = exporter.render()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+def serve(sampler, host='127.0.0.1', port=9217):
+    """
+    Starts *sampler* and serves its latest readings on http://*host*:*port*/
+    until interrupted
+    """
+
+    from http.server import ThreadingHTTPServer
+
+    server = ThreadingHTTPServer((host, port), _handler(Exporter(sampler)))
+    server.daemon_threads = True
+    with sampler:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m sense_hat.exporter',
+        description='Serve Sense HAT readings in the OpenMetrics format')
+    parser.add_argument('--host', default='127.0.0.1',
+        help='address to listen on (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=9217,
+        help='port to listen on (default: %(default)s)')
+    add_rate_arguments(parser)
+    options = parser.parse_args(args)
+
+    from .sense_hat import SenseHat
+
+    sense = SenseHat()
+    sampler = Sampler(sense, rates_from_arguments(options, sense))
+    serve(sampler, options.host, options.port)
+    sense.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
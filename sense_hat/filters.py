@@ -0,0 +1,429 @@
+"""
+Composable streaming filters for Sense HAT sensor data.
+
+Every filter is a pipeline stage: a callable which takes an iterable of
+samples and returns a generator of filtered samples, so stages can be chained
+one after another without holding the stream in memory:
+
+    from sense_hat import SenseHat
+    from sense_hat.filters import pipeline, samples, MovingAverage, Decimate
+
+    sense = SenseHat()
+    source = samples(sense.get_accelerometer_raw)
+    for accel in pipeline(source, MovingAverage(8), Decimate(4)):
+        print(accel)
+
+A sample may be a number, a tuple or list of numbers, or a dictionary of
+numbers such as the ones returned by `get_accelerometer_raw`; each stage
+returns samples in the same form it was given. Each stage keeps a fixed
+amount of state no matter how long the stream runs.
+
+Stages also accept NumPy arrays holding a chunk of samples along the first
+axis (see `chunks`). Chunks are filtered with vectorised NumPy operations and
+each chunk yields one output array, which is much faster than filtering one
+sample at a time at high sample rates. NumPy is only imported when chunks
+are used.
+"""
+
+import sys
+import math
+import time
+from collections import deque, namedtuple
+
+
+WindowStats = namedtuple('WindowStats', ('minimum', 'maximum', 'mean'))
+
+
+def _is_chunk(item):
+    """
+    Internal. Returns True if *item* is a NumPy array. NumPy is never
+    imported here; if nothing has imported it, *item* cannot be an array.
+    """
+
+    np = sys.modules.get('numpy')
+    return np is not None and isinstance(item, np.ndarray)
+
+
+def _unpack(sample):
+    """
+    Internal. Splits *sample* into a list of floats and a function which
+    rebuilds a sample of the same form from such a list.
+    """
+
+    if isinstance(sample, dict):
+        keys = tuple(sample)
+        return [float(sample[key]) for key in keys], \
+            lambda values: dict(zip(keys, values))
+    elif isinstance(sample, list):
+        return [float(value) for value in sample], list
+    elif isinstance(sample, tuple):
+        return [float(value) for value in sample], tuple
+    else:
+        return [float(sample)], lambda values: values[0]
+
+
+class Stage(object):
+    """
+    The base class for pipeline stages. Subclasses implement `_process`,
+    which receives the values of one sample as a list of floats and returns
+    the values of the output sample (or `None` if nothing is output) and may
+    override `_process_chunk`, which receives a two-dimensional array with
+    one sample per row.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Discards any state accumulated from earlier samples
+        """
+
+        pass
+
+    def __call__(self, source):
+        for item in source:
+            if _is_chunk(item):
+                flat = item.ndim == 1
+                result = self._process_chunk(
+                    item.reshape(-1, 1) if flat else item)
+                if result is not None:
+                    yield self._pack(
+                        result,
+                        (lambda values: values[:, 0]) if flat else
+                        (lambda values: values))
+            else:
+                values, pack = _unpack(item)
+                result = self._process(values)
+                if result is not None:
+                    yield self._pack(result, pack)
+
+    def _pack(self, result, pack):
+        return pack(result)
+
+    def _process(self, values):
+        raise NotImplementedError
+
+    def _process_chunk(self, data):
+        """
+        Internal. Fallback for stages without a vectorised implementation;
+        processes the rows of *data* one at a time.
+        """
+
+        import numpy as np
+
+        results = [
+            result for result in (self._process(list(row)) for row in data)
+            if result is not None
+        ]
+        if results:
+            return np.array(results, dtype=float)
+        return None
+
+
+class MovingAverage(Stage):
+    """
+    Outputs the mean of the last *size* samples for every sample received.
+    Until *size* samples have been seen, the mean of those received so far
+    is output.
+    """
+
+    def __init__(self, size):
+        if size < 1:
+            raise ValueError('size must be at least 1')
+        self.size = size
+        super(MovingAverage, self).__init__()
+
+    def reset(self):
+        self._window = deque(maxlen=self.size)
+        self._total = None
+
+    def _process(self, values):
+        if self._total is None or len(self._total) != len(values):
+            self._window.clear()
+            self._total = [0.0] * len(values)
+        if len(self._window) == self.size:
+            oldest = self._window[0]
+            self._total = [t - o for t, o in zip(self._total, oldest)]
+        self._window.append(values)
+        self._total = [t + v for t, v in zip(self._total, values)]
+        count = len(self._window)
+        return [t / count for t in self._total]
+
+    def _process_chunk(self, data):
+        import numpy as np
+
+        if self._total is None or len(self._total) != data.shape[1]:
+            self._window.clear()
+        history = np.array(self._window, dtype=float).reshape(-1, data.shape[1])
+        joined = np.concatenate((history, data))
+        sums = np.concatenate(
+            (np.zeros((1, data.shape[1])), np.cumsum(joined, axis=0)))
+        ends = np.arange(len(history), len(joined)) + 1
+        starts = np.maximum(ends - self.size, 0)
+        result = (sums[ends] - sums[starts]) / (ends - starts)[:, None]
+        self._window.clear()
+        self._window.extend(joined[-self.size:].tolist())
+        self._total = np.sum(self._window, axis=0).tolist()
+        return result
+
+
+class ExponentialSmoothing(Stage):
+    """
+    Outputs an exponentially weighted moving average of the samples
+    received. *alpha* (between 0 and 1) is the weight given to each new
+    sample; smaller values smooth more heavily.
+    """
+
+    def __init__(self, alpha):
+        if not 0 < alpha <= 1:
+            raise ValueError('alpha must be greater than 0 and at most 1')
+        self.alpha = alpha
+        super(ExponentialSmoothing, self).__init__()
+
+    def reset(self):
+        self._last = None
+
+    def _process(self, values):
+        if self._last is None or len(self._last) != len(values):
+            self._last = values
+        else:
+            alpha = self.alpha
+            self._last = [
+                last + alpha * (value - last)
+                for last, value in zip(self._last, values)
+            ]
+        return self._last
+
+    def _process_chunk(self, data):
+        import numpy as np
+
+        data = np.asarray(data, dtype=float)
+        if self._last is None or len(self._last) != data.shape[1]:
+            self._last = data[0].tolist()
+        decay = 1 - self.alpha
+        if decay == 0:
+            result = data.copy()
+        else:
+            # The recurrence is evaluated in closed form over blocks which are
+            # short enough for decay ** -length to stay well within range
+            block = max(1, int(12 * math.log(10) / -math.log(decay)))
+            result = np.empty_like(data)
+            last = np.array(self._last, dtype=float)
+            for start in range(0, len(data), block):
+                part = data[start:start + block]
+                powers = decay ** np.arange(1, len(part) + 1)
+                weighted = np.cumsum(part / powers[:, None], axis=0)
+                smoothed = powers[:, None] * (last + self.alpha * weighted)
+                result[start:start + block] = smoothed
+                last = smoothed[-1]
+        self._last = result[-1].tolist()
+        return result
+
+
+class MedianFilter(Stage):
+    """
+    Outputs the median of the last *size* samples for every sample received,
+    rejecting isolated spikes. Each component of a sample is filtered
+    independently.
+    """
+
+    def __init__(self, size=3):
+        if size < 1:
+            raise ValueError('size must be at least 1')
+        self.size = size
+        super(MedianFilter, self).__init__()
+
+    def reset(self):
+        self._window = deque(maxlen=self.size)
+
+    def _process(self, values):
+        if self._window and len(self._window[0]) != len(values):
+            self._window.clear()
+        self._window.append(values)
+        count = len(self._window)
+        middle = count // 2
+        result = []
+        for column in zip(*self._window):
+            ordered = sorted(column)
+            if count % 2:
+                result.append(ordered[middle])
+            else:
+                result.append((ordered[middle - 1] + ordered[middle]) / 2)
+        return result
+
+    def _process_chunk(self, data):
+        import numpy as np
+        from numpy.lib.stride_tricks import sliding_window_view
+
+        if self._window and len(self._window[0]) != data.shape[1]:
+            self._window.clear()
+        # Outputs produced before the window fills up have fewer samples to
+        # work with, so those few are handled one at a time
+        warm_up = min(len(data), max(0, self.size - 1 - len(self._window)))
+        head = [self._process(list(row)) for row in data[:warm_up]]
+        data = data[warm_up:]
+        if not len(data):
+            return np.array(head, dtype=float) if head else None
+        history = np.array(
+            list(self._window)[len(self._window) - (self.size - 1):],
+            dtype=float).reshape(-1, data.shape[1])
+        joined = np.concatenate((history, data))
+        windows = sliding_window_view(joined, self.size, axis=0)
+        result = np.median(windows, axis=-1)
+        self._window.extend(joined[-self.size:].tolist())
+        if head:
+            result = np.concatenate((np.array(head, dtype=float), result))
+        return result
+
+
+class Decimate(Stage):
+    """
+    Outputs the first of every *factor* samples received, discarding the
+    others. Combine with `MovingAverage` to avoid aliasing.
+    """
+
+    def __init__(self, factor):
+        if factor < 1:
+            raise ValueError('factor must be at least 1')
+        self.factor = factor
+        super(Decimate, self).__init__()
+
+    def reset(self):
+        self._count = 0
+
+    def _process(self, values):
+        keep = self._count == 0
+        self._count = (self._count + 1) % self.factor
+        return values if keep else None
+
+    def _process_chunk(self, data):
+        start = -self._count % self.factor
+        self._count = (self._count + len(data)) % self.factor
+        result = data[start::self.factor]
+        return result if len(result) else None
+
+
+class Window(Stage):
+    """
+    Groups samples into consecutive windows of *size* samples and outputs a
+    `WindowStats` tuple of the minimum, maximum and mean of each window once
+    it is complete. Each field of the tuple has the same form as the
+    samples; for chunks, each field is an array with one row per window.
+    """
+
+    def __init__(self, size):
+        if size < 1:
+            raise ValueError('size must be at least 1')
+        self.size = size
+        super(Window, self).__init__()
+
+    def reset(self):
+        self._count = 0
+        self._minimum = self._maximum = self._total = None
+
+    def _pack(self, result, pack):
+        return WindowStats(*(pack(field) for field in result))
+
+    def _process(self, values):
+        if self._count == 0 or len(self._total) != len(values):
+            self._count = 0
+            self._minimum = list(values)
+            self._maximum = list(values)
+            self._total = list(values)
+        else:
+            self._minimum = [min(m, v) for m, v in zip(self._minimum, values)]
+            self._maximum = [max(m, v) for m, v in zip(self._maximum, values)]
+            self._total = [t + v for t, v in zip(self._total, values)]
+        self._count += 1
+        if self._count == self.size:
+            self._count = 0
+            return (
+                self._minimum,
+                self._maximum,
+                [t / self.size for t in self._total])
+        return None
+
+    def _process_chunk(self, data):
+        import numpy as np
+
+        results = []
+        # Finish any window left open by the previous sample or chunk
+        while self._count and len(data):
+            result = self._process(list(data[0]))
+            data = data[1:]
+            if result is not None:
+                results.append([np.array([field]) for field in result])
+        whole = len(data) - len(data) % self.size
+        if whole:
+            windows = data[:whole].reshape(-1, self.size, data.shape[1])
+            results.append([
+                windows.min(axis=1),
+                windows.max(axis=1),
+                windows.mean(axis=1)])
+        for row in data[whole:]:
+            self._process(list(row))
+        if not results:
+            return None
+        return tuple(
+            np.concatenate([result[field] for result in results]).astype(float)
+            for field in range(3))
+
+
+def pipeline(source, *stages):
+    """
+    Chains *stages* together, feeding *source* into the first. Returns a
+    generator of the samples output by the last stage.
+    """
+
+    for stage in stages:
+        source = stage(source)
+    return source
+
+
+def samples(getter, interval=None, count=None):
+    """
+    Returns a generator which calls *getter* (e.g.
+    `sense.get_accelerometer_raw`) repeatedly, yielding each value it
+    returns. If *interval* is given, readings are spaced that many seconds
+    apart. If *count* is given, the generator stops after that many samples.
+    """
+
+    taken = 0
+    deadline = time.time()
+    while count is None or taken < count:
+        yield getter()
+        taken += 1
+        if interval:
+            deadline += interval
+            delay = deadline - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                deadline = time.time()
+
+
+def chunks(source, size):
+    """
+    Groups the samples from *source* into NumPy arrays of up to *size* rows
+    so that the stages they are fed to can process them in batches. Numbers
+    become one-dimensional arrays; tuples, lists and dictionaries become
+    two-dimensional arrays with one column per component, in the order the
+    components appear in the first sample.
+    """
+
+    import numpy as np
+
+    keys = None
+    batch = []
+    for sample in source:
+        if isinstance(sample, dict):
+            if keys is None:
+                keys = tuple(sample)
+            sample = [sample[key] for key in keys]
+        batch.append(sample)
+        if len(batch) == size:
+            yield np.array(batch, dtype=float)
+            batch = []
+    if batch:
+        yield np.array(batch, dtype=float)
@@ -0,0 +1,250 @@
+"""
+Recognition of clicks, long presses, repeats and sequences on the joystick.
+
+A `GestureRecogniser` turns the `InputEvent` tuples of the joystick into
+higher-level gestures, timed by the events' own timestamps, so no sleeping
+or polling is needed. Feed it events from a callback, `get_events` or
+`events`:
+
+    from sense_hat import SenseHat
+    from sense_hat.gestures import GestureRecogniser
+
+    sense = SenseHat()
+    gestures = GestureRecogniser()
+    gestures.when_double_click = lambda event: print(event.direction)
+    gestures.when_long_press = lambda: sense.clear()
+    gestures.add_sequence(['up', 'up', 'down', 'down'], 'secret')
+    gestures.when_sequence = lambda event: print(event.value)
+    sense.stick.direction_any = gestures.update
+
+A long press and repeats can only be recognised when an event arrives, so
+they are recognised on the joystick's "held" events (which the kernel sends
+several times a second while a direction is held) and on release.
+"""
+
+from collections import namedtuple
+
+from .stick import (
+    wrap_callback,
+    ACTION_PRESSED,
+    ACTION_RELEASED,
+    ACTION_HELD,
+    )
+
+
+GESTURE_CLICK = 'click'
+GESTURE_DOUBLE_CLICK = 'double_click'
+GESTURE_LONG_PRESS = 'long_press'
+GESTURE_REPEAT = 'repeat'
+GESTURE_SEQUENCE = 'sequence'
+
+
+GestureEvent = namedtuple(
+    'GestureEvent', ('timestamp', 'gesture', 'direction', 'value'))
+
+
+class GestureRecogniser(object):
+    """
+    Recognises gestures in the joystick events passed to `update`. The
+    callbacks `when_click`, `when_double_click`, `when_long_press`,
+    `when_repeat` and `when_sequence` are called with no parameters or with
+    a `GestureEvent`, whose value is:
+
+    * click: the time in seconds the direction was held
+    * double click: the time in seconds between the clicks
+    * long press: the time in seconds the direction had been held
+    * repeat: the number of repeats so far in this press, starting at 1
+    * sequence: the name given to `add_sequence`
+
+    A click is a press released within *long_press_time* seconds. Two clicks
+    of the same direction with at most *double_click_time* seconds between
+    them make a double click; both clicks are also reported as clicks.
+    Holding a direction for *long_press_time* seconds is a long press. Once
+    a direction has been held for *repeat_delay* seconds it repeats at
+    *repeat_rate* times a second (limited by the rate of "held" events).
+    """
+
+    def __init__(
+            self, double_click_time=0.4, long_press_time=1.0,
+            repeat_delay=0.5, repeat_rate=10):
+        self.double_click_time = double_click_time
+        self.long_press_time = long_press_time
+        self.repeat_delay = repeat_delay
+        self.repeat_rate = repeat_rate
+        self.when_click = None
+        self.when_double_click = None
+        self.when_long_press = None
+        self.when_repeat = None
+        self.when_sequence = None
+        self._sequences = {}
+        # The press in progress for each direction: (time pressed, whether
+        # it was a long press, repeats, time of the next repeat)
+        self._presses = {}
+        # The time of the last click of each direction
+        self._clicks = {}
+        # The recent presses of any direction: (time, direction)
+        self._history = []
+
+    @property
+    def when_click(self):
+        """
+        The function to call when a direction is clicked
+        """
+
+        return self._when_click
+
+    @when_click.setter
+    def when_click(self, value):
+        self._when_click = wrap_callback(value)
+
+    @property
+    def when_double_click(self):
+        """
+        The function to call when a direction is double-clicked
+        """
+
+        return self._when_double_click
+
+    @when_double_click.setter
+    def when_double_click(self, value):
+        self._when_double_click = wrap_callback(value)
+
+    @property
+    def when_long_press(self):
+        """
+        The function to call when a direction is held for
+        `long_press_time` seconds
+        """
+
+        return self._when_long_press
+
+    @when_long_press.setter
+    def when_long_press(self, value):
+        self._when_long_press = wrap_callback(value)
+
+    @property
+    def when_repeat(self):
+        """
+        The function to call on each repeat of a held direction
+        """
+
+        return self._when_repeat
+
+    @when_repeat.setter
+    def when_repeat(self, value):
+        self._when_repeat = wrap_callback(value)
+
+    @property
+    def when_sequence(self):
+        """
+        The function to call when a sequence added by `add_sequence` is
+        completed
+        """
+
+        return self._when_sequence
+
+    @when_sequence.setter
+    def when_sequence(self, value):
+        self._when_sequence = wrap_callback(value)
+
+    def add_sequence(self, directions, name=None, interval=1.0):
+        """
+        Recognises presses of *directions* (a list of direction strings) in
+        order, each within *interval* seconds of the last, as the sequence
+        *name* (which defaults to the directions joined with commas).
+        Returns the name
+        """
+
+        directions = tuple(directions)
+        if not directions:
+            raise ValueError('A sequence needs at least one direction')
+        if name is None:
+            name = ','.join(directions)
+        self._sequences[name] = (directions, interval)
+        return name
+
+    def remove_sequence(self, name):
+        """
+        Stops recognising the sequence *name*
+        """
+
+        del self._sequences[name]
+
+    def reset(self):
+        """
+        Forgets presses in progress and the history of clicks and presses
+        """
+
+        self._presses.clear()
+        self._clicks.clear()
+        del self._history[:]
+
+    def _emit(self, callback, timestamp, gesture, direction, value):
+        if callback:
+            callback(GestureEvent(timestamp, gesture, direction, value))
+
+    def update(self, event):
+        """
+        Recognises gestures completed by the joystick *event*, an
+        `InputEvent` tuple
+        """
+
+        timestamp, direction = event.timestamp, event.direction
+        if event.action == ACTION_PRESSED:
+            self._presses[direction] = [
+                timestamp, False, 0, timestamp + self.repeat_delay]
+            self._pressed(timestamp, direction)
+            return
+        press = self._presses.get(direction)
+        if press is None:
+            # Pressed before we started watching
+            return
+        held = timestamp - press[0]
+        if not press[1] and held >= self.long_press_time:
+            press[1] = True
+            self._emit(
+                self._when_long_press, timestamp, GESTURE_LONG_PRESS,
+                direction, held)
+        if event.action == ACTION_HELD:
+            if timestamp >= press[3]:
+                press[2] += 1
+                # Skip repeats missed between held events rather than
+                # reporting them in a burst
+                period = 1 / self.repeat_rate
+                press[3] += period * (1 + (timestamp - press[3]) // period)
+                self._emit(
+                    self._when_repeat, timestamp, GESTURE_REPEAT, direction,
+                    press[2])
+        elif event.action == ACTION_RELEASED:
+            del self._presses[direction]
+            if not press[1]:
+                self._clicked(timestamp, direction, held)
+
+    def _clicked(self, timestamp, direction, held):
+        self._emit(self._when_click, timestamp, GESTURE_CLICK, direction, held)
+        last = self._clicks.pop(direction, None)
+        pressed = timestamp - held
+        if last is not None and pressed - last <= self.double_click_time:
+            self._emit(
+                self._when_double_click, timestamp, GESTURE_DOUBLE_CLICK,
+                direction, pressed - last)
+        else:
+            self._clicks[direction] = timestamp
+
+    def _pressed(self, timestamp, direction):
+        if not self._sequences:
+            return
+        history = self._history
+        history.append((timestamp, direction))
+        longest = max(len(d) for d, interval in self._sequences.values())
+        del history[:-longest]
+        for name, (directions, interval) in self._sequences.items():
+            recent = history[-len(directions):]
+            if (len(recent) == len(directions) and
+                    all(d == want for (t, d), want
+                        in zip(recent, directions)) and
+                    all(later[0] - earlier[0] <= interval
+                        for earlier, later in zip(recent, recent[1:]))):
+                self._emit(
+                    self._when_sequence, timestamp, GESTURE_SEQUENCE,
+                    direction, name)
@@ -0,0 +1,95 @@
+"""
+Hooks for tracing Sense HAT hardware operations.
+
+A hook is a callable which is passed a `HookEvent` when each hardware
+operation (see `stats`) begins and ends, from the thread performing it:
+
+    from sense_hat import hooks
+
+    def trace(event):
+        print(event.phase, event.operation, event.device, event.duration)
+
+    hooks.add_hook(trace)
+
+Hooks are called while the device is locked, so they should return quickly.
+An operation which raises an exception has no 'end' event. While no hooks are
+installed the only cost is a check of an empty tuple.
+"""
+
+from threading import Lock, get_ident
+from time import perf_counter
+from collections import namedtuple
+
+from . import stats
+
+
+HookEvent = namedtuple('HookEvent',
+    ('phase', 'operation', 'device', 'nbytes', 'timestamp', 'duration',
+     'thread'))
+HookEvent.__doc__ = """
+A hardware operation beginning or ending. *phase* is 'begin' or 'end',
+*operation* is the name the operation's statistics are recorded under,
+*device* identifies the device, *nbytes* is the number of bytes transferred
+(`None` if unknown), *timestamp* is the `time.perf_counter` time of the event,
+*duration* is the length of the operation in seconds ('end' events only) and
+*thread* is the identifier of the thread performing it
+"""
+
+_lock = Lock()
+_hooks = ()
+
+
+def add_hook(hook):
+    """
+    Arranges for *hook* to be called with a `HookEvent` at the beginning and
+    end of every hardware operation
+    """
+
+    global _hooks
+
+    with _lock:
+        _hooks = _hooks + (hook,)
+
+
+def remove_hook(hook):
+    """
+    Stops calling *hook*, which must have been added with `add_hook`
+    """
+
+    global _hooks
+
+    with _lock:
+        hooks = list(_hooks)
+        hooks.remove(hook)
+        _hooks = tuple(hooks)
+
+
+def begin(operation, device, nbytes=None):
+    """
+    Internal. Marks the beginning of *operation* on *device*, returning the
+    start time to pass to `end`
+    """
+
+    start = perf_counter()
+    if _hooks:
+        event = HookEvent(
+            'begin', operation, device, nbytes, start, None, get_ident())
+        for hook in _hooks:
+            hook(event)
+    return start
+
+
+def end(operation, device, nbytes, start):
+    """
+    Internal. Marks the end of *operation* on *device*, which began at
+    *start*, and records its duration
+    """
+
+    now = perf_counter()
+    duration = now - start
+    stats.record(operation, duration)
+    if _hooks:
+        event = HookEvent(
+            'end', operation, device, nbytes, now, duration, get_ident())
+        for hook in _hooks:
+            hook(event)
@@ -0,0 +1,305 @@
+"""
+A single-threaded event loop for the Sense HAT.
+
+`EventLoop` runs joystick callbacks, sensor sampling, LED animations and
+timers in one thread, sleeping in `select` until the joystick has an event
+or the next deadline arrives, instead of running a callback thread, a
+polling loop and a blocking `show_message` side by side:
+
+    from sense_hat import SenseHat
+    from sense_hat.sampler import Sampler
+
+    sense = SenseHat()
+    loop = sense.loop
+    sampler = Sampler(sense, {'humidity': 1})
+    sampler.add_listener(lambda row: print(row['humidity']))
+    loop.add_sampler(sampler)
+    sense.stick.direction_middle = lambda: loop.show_message('Hello')
+    loop.call_later(60, loop.stop)
+    sense.run()
+
+Everything the loop calls runs in the loop's thread, so callbacks must not
+block; they can schedule further work with `call_later` and `call_at`.
+"""
+
+import os
+import time
+import heapq
+import logging
+import selectors
+import threading
+from collections import deque
+from itertools import count
+
+
+class Timer(object):
+    """
+    A call scheduled on an `EventLoop`, which can be cancelled
+    """
+
+    def __init__(self, when, fn, args):
+        self.when = when
+        self._fn = fn
+        self._args = args
+        self._cancelled = False
+
+    def cancel(self):
+        """
+        Stops the call from being made, if it hasn't been already
+        """
+
+        self._cancelled = True
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    def _run(self):
+        if not self._cancelled:
+            self._fn(*self._args)
+
+
+class EventLoop(object):
+    """
+    Runs the joystick callbacks of *sense*, the samplers added with
+    `add_sampler`, animations and timers in the thread which calls `run`.
+
+    While the loop is running the joystick's callbacks are called from the
+    loop rather than from the joystick's callback thread (and its
+    `callback_executor`, if any, is still used).
+    """
+
+    def __init__(self, sense):
+        self._sense = sense
+        self._timers = []
+        self._sequence = count()
+        self._samplers = []
+        self._calls = deque()
+        self._animation = None
+        self._running = False
+        self._stopping = False
+        self._wakeup = None
+        self._thread = None
+
+    @property
+    def running(self):
+        """
+        Returns True while `run` is running
+        """
+
+        return self._running
+
+    def call_at(self, when, fn, *args):
+        """
+        Calls *fn* with *args* at the `time.monotonic` time *when*. Returns
+        a `Timer`
+        """
+
+        timer = Timer(when, fn, args)
+        heapq.heappush(self._timers, (when, next(self._sequence), timer))
+        return timer
+
+    def call_later(self, delay, fn, *args):
+        """
+        Calls *fn* with *args* after *delay* seconds. Returns a `Timer`
+        """
+
+        return self.call_at(time.monotonic() + delay, fn, *args)
+
+    def call_soon_threadsafe(self, fn, *args):
+        """
+        Calls *fn* with *args* from the loop as soon as possible. This is the
+        only method which may be called from other threads
+        """
+
+        self._calls.append((fn, args))
+        self._wake()
+
+    def stop(self):
+        """
+        Makes `run` return once the current callback returns, or as soon as
+        it starts if it isn't running yet. May be called from other threads
+        """
+
+        self._stopping = True
+        self._wake()
+
+    def _wake(self):
+        wakeup = self._wakeup
+        if wakeup is not None:
+            try:
+                os.write(wakeup[1], b'\0')
+            except OSError:
+                # The loop has just finished, or already has a wake-up
+                # pending
+                pass
+
+    def _events_queued(self):
+        """
+        Internal. Wakes the loop when another thread reads joystick events
+        for it; events the loop reads itself are dispatched straight away
+        """
+
+        if threading.get_ident() != self._thread:
+            self._wake()
+
+    def add_sampler(self, sampler):
+        """
+        Samples with *sampler* (a `Sampler` which has not been started) from
+        the loop. Its listeners and triggers are called from the loop
+        """
+
+        if sampler.running:
+            raise ValueError('Sampler is already running in its own thread')
+        self._samplers.append(sampler)
+
+    def remove_sampler(self, sampler):
+        """
+        Stops sampling with *sampler*
+        """
+
+        self._samplers.remove(sampler)
+
+    def animate(self, frames, interval, when_done=None):
+        """
+        Shows *frames*, an iterable of lists of 64 pixels (as passed to
+        `SenseHat.set_pixels`), one every *interval* seconds, then calls
+        *when_done* (if given). Starting an animation stops the previous one.
+        Returns a `Timer` which stops the animation if cancelled
+        """
+
+        return self._animate(frames, interval, when_done, 0)
+
+    def _animate(self, frames, interval, when_done, rotation_offset):
+        if self._animation is not None:
+            self._animation.cancel()
+        # Frames are due at fixed times from the start, so a late frame
+        # doesn't delay the rest
+        animation = self._animation = Timer(time.monotonic(), None, ())
+        self.call_at(
+            animation.when, self._next_frame, animation, iter(frames),
+            interval, 0, when_done, rotation_offset)
+        return animation
+
+    def _next_frame(
+            self, animation, frames, interval, index, when_done,
+            rotation_offset):
+        if animation.cancelled:
+            return
+        pixels = next(frames, None)
+        if pixels is None:
+            self._animation = None
+            if when_done is not None:
+                when_done()
+            return
+        self._sense._set_pixels(pixels, rotation_offset)
+        self.call_at(
+            animation.when + (index + 1) * interval, self._next_frame,
+            animation, frames, interval, index + 1, when_done,
+            rotation_offset)
+
+    def show_message(
+            self, text_string, scroll_speed=.1, text_colour=[255, 255, 255],
+            back_colour=[0, 0, 0], when_done=None):
+        """
+        Scrolls *text_string* across the LED matrix like
+        `SenseHat.show_message`, without blocking the loop. Returns a `Timer`
+        which stops the message if cancelled
+        """
+
+        # Text is drawn with the pixel map rotated, as in show_message
+        return self._animate(
+            self._sense._message_frames(text_string, text_colour, back_colour),
+            scroll_speed, when_done, -90)
+
+    def run(self, timeout=None):
+        """
+        Runs the loop until `stop` is called or, if *timeout* is given, for
+        *timeout* seconds
+        """
+
+        if self._running:
+            raise RuntimeError('The loop is already running')
+        end = None if timeout is None else time.monotonic() + timeout
+        selector = selectors.DefaultSelector()
+        self._wakeup = os.pipe()
+        os.set_blocking(self._wakeup[1], False)
+        selector.register(self._wakeup[0], selectors.EVENT_READ)
+        self._thread = threading.get_ident()
+        # Only take over the joystick if it is in use. Another thread may
+        # read the device first, so the loop is also woken when events are
+        # queued for it
+        stick = self._sense.__dict__.get('_stick')
+        subscription = None
+        if stick is not None:
+            subscription = stick.subscribe(stick.QUEUE_SIZE)
+            subscription._notify = self._events_queued
+            stick._set_external_dispatch(True)
+            selector.register(stick._reader.file, selectors.EVENT_READ)
+        self._running = True
+        try:
+            while not self._stopping:
+                now = time.monotonic()
+                if end is not None and now >= end:
+                    break
+                deadline = self._run_due(now)
+                if end is not None:
+                    deadline = min(deadline, end)
+                delay = max(0, deadline - time.monotonic())
+                readable = False
+                for key, mask in selector.select(
+                        None if delay == float('inf') else delay):
+                    if key.fd == self._wakeup[0]:
+                        os.read(self._wakeup[0], 4096)
+                    else:
+                        readable = True
+                if subscription is not None and (
+                        readable or len(subscription)):
+                    for event in subscription.get_events():
+                        self._call(stick._dispatch_event, event)
+                self._run_calls()
+        finally:
+            self._running = False
+            self._stopping = False
+            self._thread = None
+            selector.close()
+            wakeup, self._wakeup = self._wakeup, None
+            for fd in wakeup:
+                os.close(fd)
+            if stick is not None:
+                subscription.close()
+                stick._set_external_dispatch(False)
+
+    def _run_calls(self):
+        calls = self._calls
+        while calls:
+            fn, args = calls.popleft()
+            self._call(fn, *args)
+
+    def _run_due(self, now):
+        """
+        Internal. Runs the timers and samplers which are due at *now*, and
+        returns the time the next is due
+        """
+
+        self._run_calls()
+        timers = self._timers
+        while timers and timers[0][0] <= now:
+            self._call(heapq.heappop(timers)[2]._run)
+        for sampler in self._samplers:
+            if sampler.next_deadline() <= now:
+                self._call(sampler.poll)
+        # Drop cancelled timers rather than waking for them
+        while timers and timers[0][2].cancelled:
+            heapq.heappop(timers)
+        deadline = timers[0][0] if timers else float('inf')
+        for sampler in self._samplers:
+            deadline = min(deadline, sampler.next_deadline())
+        return deadline
+
+    def _call(self, fn, *args):
+        try:
+            fn(*args)
+        except Exception:
+            # One failing callback shouldn't stop everything else
+            logging.exception('Event loop callback failed')
@@ -0,0 +1,314 @@
+"""
+Detection of shakes, taps, free-fall and orientation changes.
+
+A `MotionDetector` examines every accelerometer and gyroscope reading taken
+by a `Sampler`, so it runs at the IMU's native rate in the sampling thread
+and catches taps too short to be seen by polling:
+
+    from sense_hat import SenseHat
+    from sense_hat.sampler import Sampler
+    from sense_hat.motion import MotionDetector
+
+    sense = SenseHat()
+    with Sampler(sense, {'imu': None}) as sampler:
+        motion = MotionDetector(sampler)
+        motion.when_double_tapped = lambda: sense.show_letter('!')
+        motion.when_orientation_changed = lambda event: print(event.value)
+        ...
+
+The detector separates gravity from the motion of the Sense HAT with a
+low-pass filter on the accelerometer readings. Gravity gives the
+orientation; the remainder (in Gs) and the rotation rate from the gyroscope
+are used to detect taps and shakes. Free-fall is the total acceleration
+staying close to zero.
+"""
+
+import math
+from collections import deque, namedtuple
+
+from .stick import wrap_callback
+
+
+MOTION_SHAKE = 'shake'
+MOTION_TAP = 'tap'
+MOTION_DOUBLE_TAP = 'double_tap'
+MOTION_FREE_FALL = 'free_fall'
+MOTION_ORIENTATION = 'orientation'
+
+# Orientations, named by the way up the Sense HAT is (the axis carrying
+# gravity)
+ORIENTATIONS = {
+    ('z', 1): 'face_up',
+    ('z', -1): 'face_down',
+    ('y', 1): 'portrait',
+    ('y', -1): 'portrait_inverted',
+    ('x', 1): 'landscape_left',
+    ('x', -1): 'landscape_right',
+}
+
+
+MotionEvent = namedtuple('MotionEvent', ('timestamp', 'motion', 'value'))
+
+
+class MotionDetector(object):
+    """
+    Detects motion in the IMU readings of *sampler* (if given; otherwise
+    pass rows to `update` yourself). The callbacks `when_shaken`,
+    `when_tapped`, `when_double_tapped`, `when_free_fall` and
+    `when_orientation_changed` are called with no parameters or with a
+    `MotionEvent`, whose value is:
+
+    * shake: the peak acceleration (in Gs) during the shake
+    * tap and double tap: the peak acceleration of the (last) tap
+    * free-fall: the time in seconds since the fall began
+    * orientation: the new orientation, one of the values of `ORIENTATIONS`
+
+    Every tap is reported, so a double tap is reported as a tap, then a
+    double tap when the second tap lands.
+
+    The thresholds are attributes which can be tuned after construction.
+    """
+
+    def __init__(self, sampler=None):
+        # Gravity filter time constant (seconds)
+        self.gravity_time = 0.2
+        # A tap is motion above tap_threshold Gs lasting no more than
+        # tap_duration seconds; a second tap within double_tap_window
+        # seconds of the first makes a double tap
+        self.tap_threshold = 0.8
+        self.tap_duration = 0.1
+        self.double_tap_window = 0.4
+        # A shake is shake_count peaks of motion above shake_threshold Gs
+        # or rotation above shake_rotation radians/second within
+        # shake_window seconds
+        self.shake_threshold = 1.2
+        self.shake_rotation = 6.0
+        self.shake_count = 4
+        self.shake_window = 0.8
+        # Free-fall is total acceleration below free_fall_threshold Gs for
+        # free_fall_time seconds
+        self.free_fall_threshold = 0.3
+        self.free_fall_time = 0.08
+        # An orientation is reported once gravity has been mostly (by
+        # orientation_threshold) along one axis for orientation_time seconds
+        self.orientation_threshold = 0.8
+        self.orientation_time = 0.3
+
+        self.when_shaken = None
+        self.when_tapped = None
+        self.when_double_tapped = None
+        self.when_free_fall = None
+        self.when_orientation_changed = None
+
+        self._last = None
+        self._gravity = None
+        self._tap_start = None
+        self._tap_peak = 0
+        self._last_tap = None
+        self._peaks = deque()
+        self._last_motion = None
+        self._last_rotation = None
+        self._shake_peak = 0
+        self._shaking = False
+        self._fall_start = None
+        self._falling = False
+        self._orientation = None
+        self._candidate = None
+        self._candidate_since = None
+        if sampler is not None:
+            sampler.add_listener(self.update, streams=['imu'])
+
+    @property
+    def when_shaken(self):
+        """
+        The function to call when the Sense HAT is shaken
+        """
+
+        return self._when_shaken
+
+    @when_shaken.setter
+    def when_shaken(self, value):
+        self._when_shaken = wrap_callback(value)
+
+    @property
+    def when_tapped(self):
+        """
+        The function to call when the Sense HAT is tapped
+        """
+
+        return self._when_tapped
+
+    @when_tapped.setter
+    def when_tapped(self, value):
+        self._when_tapped = wrap_callback(value)
+
+    @property
+    def when_double_tapped(self):
+        """
+        The function to call when the Sense HAT is tapped twice
+        """
+
+        return self._when_double_tapped
+
+    @when_double_tapped.setter
+    def when_double_tapped(self, value):
+        self._when_double_tapped = wrap_callback(value)
+
+    @property
+    def when_free_fall(self):
+        """
+        The function to call when the Sense HAT starts falling
+        """
+
+        return self._when_free_fall
+
+    @when_free_fall.setter
+    def when_free_fall(self, value):
+        self._when_free_fall = wrap_callback(value)
+
+    @property
+    def when_orientation_changed(self):
+        """
+        The function to call when the Sense HAT is turned to a new
+        orientation
+        """
+
+        return self._when_orientation_changed
+
+    @when_orientation_changed.setter
+    def when_orientation_changed(self, value):
+        self._when_orientation_changed = wrap_callback(value)
+
+    @property
+    def orientation(self):
+        """
+        The current orientation, one of the values of `ORIENTATIONS`, or
+        `None` until one has been detected
+        """
+
+        return self._orientation
+
+    def _emit(self, callback, timestamp, motion, value):
+        if callback:
+            callback(MotionEvent(timestamp, motion, value))
+
+    def update(self, row):
+        """
+        Examines a new *row* of IMU readings, as produced by `Sampler`
+        """
+
+        timestamp = row['timestamp']
+        accel = (row['accel_x'], row['accel_y'], row['accel_z'])
+        gyro = (row['gyro_x'], row['gyro_y'], row['gyro_z'])
+        if self._last is None:
+            self._last = timestamp
+            self._gravity = accel
+            return
+        dt = timestamp - self._last
+        self._last = timestamp
+        if dt <= 0:
+            return
+
+        alpha = min(1.0, dt / self.gravity_time)
+        self._gravity = tuple(
+            g + alpha * (a - g) for g, a in zip(self._gravity, accel))
+        total = math.sqrt(sum(a * a for a in accel))
+        dynamic = tuple(a - g for a, g in zip(accel, self._gravity))
+        motion = math.sqrt(sum(d * d for d in dynamic))
+        rotation = math.sqrt(sum(w * w for w in gyro))
+
+        self._detect_free_fall(timestamp, total)
+        self._detect_tap(timestamp, motion)
+        self._detect_shake(timestamp, dynamic, motion, gyro, rotation)
+        self._detect_orientation(timestamp)
+
+    def _detect_free_fall(self, timestamp, total):
+        if total < self.free_fall_threshold:
+            if self._fall_start is None:
+                self._fall_start = timestamp
+            elapsed = timestamp - self._fall_start
+            if not self._falling and elapsed >= self.free_fall_time:
+                self._falling = True
+                self._emit(
+                    self._when_free_fall, timestamp, MOTION_FREE_FALL,
+                    elapsed)
+        elif total > 2 * self.free_fall_threshold:
+            self._fall_start = None
+            self._falling = False
+
+    def _detect_tap(self, timestamp, motion):
+        if motion > self.tap_threshold:
+            if self._tap_start is None:
+                self._tap_start = timestamp
+                self._tap_peak = 0
+            self._tap_peak = max(self._tap_peak, motion)
+        elif self._tap_start is not None and motion < self.tap_threshold / 2:
+            duration = timestamp - self._tap_start
+            self._tap_start = None
+            if duration > self.tap_duration:
+                # Too long for a tap; the Sense HAT is being moved
+                self._last_tap = None
+                return
+            self._emit(self._when_tapped, timestamp, MOTION_TAP, self._tap_peak)
+            if (self._last_tap is not None and
+                    timestamp - self._last_tap <= self.double_tap_window):
+                self._last_tap = None
+                self._emit(
+                    self._when_double_tapped, timestamp, MOTION_DOUBLE_TAP,
+                    self._tap_peak)
+            else:
+                self._last_tap = timestamp
+
+    def _detect_shake(self, timestamp, dynamic, motion, gyro, rotation):
+        peaks = self._peaks
+        while peaks and timestamp - peaks[0] > self.shake_window:
+            peaks.popleft()
+        # A peak is motion or rotation reversing direction since the last
+        # peak
+        if motion > self.shake_threshold:
+            if _reverses(dynamic, self._last_motion):
+                peaks.append(timestamp)
+            self._last_motion = dynamic
+            self._shake_peak = max(self._shake_peak, motion)
+        if rotation > self.shake_rotation:
+            if _reverses(gyro, self._last_rotation):
+                peaks.append(timestamp)
+            self._last_rotation = gyro
+        if not peaks:
+            self._shaking = False
+            self._shake_peak = 0
+            self._last_motion = self._last_rotation = None
+        elif not self._shaking and len(peaks) >= self.shake_count:
+            self._shaking = True
+            self._emit(
+                self._when_shaken, timestamp, MOTION_SHAKE, self._shake_peak)
+
+    def _detect_orientation(self, timestamp):
+        magnitude = math.sqrt(sum(g * g for g in self._gravity))
+        if magnitude == 0:
+            return
+        axis, value = max(
+            zip('xyz', self._gravity), key=lambda item: abs(item[1]))
+        if abs(value) / magnitude < self.orientation_threshold:
+            self._candidate = None
+            return
+        candidate = ORIENTATIONS[(axis, 1 if value > 0 else -1)]
+        if candidate != self._candidate:
+            self._candidate = candidate
+            self._candidate_since = timestamp
+        if (candidate != self._orientation and
+                timestamp - self._candidate_since >= self.orientation_time):
+            self._orientation = candidate
+            self._emit(
+                self._when_orientation_changed, timestamp,
+                MOTION_ORIENTATION, candidate)
+
+
+def _reverses(vector, previous):
+    """
+    Internal. Returns True if *vector* points away from *previous* (or there
+    is no previous vector)
+    """
+
+    return previous is None or sum(
+        v * p for v, p in zip(vector, previous)) < 0
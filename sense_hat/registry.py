@@ -0,0 +1,71 @@
+"""
+Process-wide registry of shared hardware handles.
+
+Each physical device should be opened once per process no matter how many
+`SenseHat`, `SenseStick` or `ColourSensor` objects use it; two RTIMU objects
+for the same IMU, for example, would each run their own sensor fusion and
+fight over the device's configuration. Objects therefore `acquire` the
+handle for a device by key, and `release` it when they are closed. The
+handle is created by the first acquirer and closed when the last user
+releases it.
+"""
+
+from threading import RLock
+
+
+# Re-entrant, as a factory may acquire the handles its handle is built on
+_lock = RLock()
+_handles = {}
+
+
+def acquire(key, factory, close=None):
+    """
+    Returns the handle registered under *key*, creating it by calling
+    *factory* if nobody currently holds it. *close*, if given, is called
+    with the handle once the last holder has released it. Every call must be
+    balanced by a call to `release`.
+    """
+
+    with _lock:
+        entry = _handles.get(key)
+        if entry is None:
+            entry = _handles[key] = [factory(), 0, close]
+        entry[1] += 1
+        return entry[0]
+
+
+def release(key):
+    """
+    Gives up one hold on the handle registered under *key*, closing it if
+    that was the last
+    """
+
+    with _lock:
+        entry = _handles[key]
+        entry[1] -= 1
+        if entry[1]:
+            return
+        del _handles[key]
+    handle, _, close = entry
+    if close is not None:
+        close(handle)
+
+
+def release_all(keys):
+    """
+    Releases every key in the list *keys*, emptying it. Suitable for use
+    with `weakref.finalize`, as it needs no reference to the holder.
+    """
+
+    while keys:
+        release(keys.pop())
+
+
+def holders(key):
+    """
+    Returns the number of holders of the handle registered under *key*
+    """
+
+    with _lock:
+        entry = _handles.get(key)
+        return entry[1] if entry else 0
@@ -0,0 +1,260 @@
+"""
+Shared-memory ring buffers of sensor samples.
+
+A `RingWriter` stores the samples of one stream in a ring of fixed-width
+records in a `multiprocessing.shared_memory` block, and any number of
+`RingReader` objects in other processes can map the block and read the
+latest samples without locks, system calls or serialisation. The writer is
+usually a `Sampler` listener:
+
+    from sense_hat import SenseHat
+    from sense_hat.sampler import Sampler
+    from sense_hat.ring import RingWriter
+
+    sense = SenseHat()
+    with RingWriter('imu', capacity=4096) as ring, Sampler(sense) as sampler:
+        sampler.add_listener(ring, streams=['imu'])
+        ...
+
+    from sense_hat.ring import RingReader
+
+    with RingReader('imu') as ring:
+        cursor = 0
+        while True:
+            records, cursor = ring.read(cursor)
+            ...
+
+The block starts with a `HEADER` of (magic, capacity, field count, stream
+name, records written), followed by *capacity* slots of a sequence number,
+a float64 timestamp and a float64 for each of the stream's fields in
+`STREAMS`. Record *n* is stored in slot *n* modulo *capacity*; the writer
+sets the slot's sequence number to 2n+1 while writing it and 2n+2 once it is
+complete, so a reader can tell when a record it read was torn by a
+concurrent write.
+"""
+
+import sys
+import struct
+from multiprocessing import shared_memory
+
+from .sampler import STREAMS
+
+
+MAGIC = b'SHRING1\0'
+HEADER = struct.Struct('<8sII16sQ')
+_COUNT = struct.Struct('<Q')
+_COUNT_OFFSET = HEADER.size - _COUNT.size
+
+
+def default_name(stream):
+    """
+    Returns the default name of the shared memory block for *stream*
+    """
+
+    return 'sense_hat_%s' % stream
+
+
+def _slot(stream):
+    return struct.Struct('<Qd%dd' % len(STREAMS[stream]))
+
+
+class RingWriter(object):
+    """
+    Creates a ring buffer holding the last *capacity* samples of *stream*
+    in the shared memory block *name* (by default, `default_name` of the
+    stream). The writer is the only process which may add records, and it
+    removes the block when closed.
+
+    The writer is a `Sampler` listener, so it can be passed straight to
+    `Sampler.add_listener`.
+    """
+
+    def __init__(self, stream, capacity=1024, name=None):
+        if stream not in STREAMS:
+            raise ValueError('Unknown stream %r' % stream)
+        if capacity < 1:
+            raise ValueError('Capacity must be at least 1')
+        self._stream = stream
+        self._fields = STREAMS[stream]
+        self._slot = _slot(stream)
+        self._capacity = capacity
+        self._count = 0
+        self._shm = shared_memory.SharedMemory(
+            name or default_name(stream), create=True,
+            size=HEADER.size + capacity * self._slot.size)
+        self._buf = self._shm.buf
+        HEADER.pack_into(
+            self._buf, 0, MAGIC, capacity, len(self._fields),
+            stream.encode('ascii'), 0)
+
+    def close(self):
+        """
+        Removes the shared memory block. Readers which have already mapped
+        it can go on reading the records it holds
+        """
+
+        if self._shm is not None:
+            self._buf.release()
+            self._buf = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.close()
+
+    @property
+    def name(self):
+        """
+        The name of the shared memory block, to pass to `RingReader`
+        """
+
+        return self._shm.name
+
+    def write(self, timestamp, values):
+        """
+        Adds a record of *values* (one for each of the stream's fields)
+        taken at *timestamp*
+        """
+
+        n = self._count
+        offset = HEADER.size + (n % self._capacity) * self._slot.size
+        _COUNT.pack_into(self._buf, offset, 2 * n + 1)
+        self._slot.pack_into(self._buf, offset, 2 * n + 1, timestamp, *values)
+        _COUNT.pack_into(self._buf, offset, 2 * n + 2)
+        self._count = n + 1
+        _COUNT.pack_into(self._buf, _COUNT_OFFSET, n + 1)
+
+    def __call__(self, row):
+        self.write(row['timestamp'], [row[field] for field in self._fields])
+
+
+class RingReader(object):
+    """
+    Maps the ring buffer in the shared memory block *name*, which is either
+    a block name or a stream name whose writer used the default name
+    """
+
+    def __init__(self, name):
+        if name in STREAMS:
+            name = default_name(name)
+        self._shm = _attach(name)
+        self._buf = self._shm.buf
+        magic, capacity, nfields, stream, _ = HEADER.unpack_from(self._buf)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError('%s is not a Sense HAT ring buffer' % name)
+        self._stream = stream.rstrip(b'\0').decode('ascii')
+        self._slot = _slot(self._stream)
+        self._capacity = capacity
+
+    def close(self):
+        if self._shm is not None:
+            self._buf.release()
+            self._buf = None
+            self._shm.close()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.close()
+
+    @property
+    def stream(self):
+        """
+        The name of the stream held in the ring buffer
+        """
+
+        return self._stream
+
+    @property
+    def fields(self):
+        """
+        The names of the values in each record
+        """
+
+        return STREAMS[self._stream]
+
+    @property
+    def capacity(self):
+        """
+        The number of records the ring buffer holds
+        """
+
+        return self._capacity
+
+    @property
+    def count(self):
+        """
+        The number of records written so far
+        """
+
+        return _COUNT.unpack_from(self._buf, _COUNT_OFFSET)[0]
+
+    def _record(self, n):
+        """
+        Internal. Returns record *n* as a (timestamp, value, ...) tuple, or
+        None if it has been overwritten or is being overwritten
+        """
+
+        offset = HEADER.size + (n % self._capacity) * self._slot.size
+        record = self._slot.unpack_from(self._buf, offset)
+        if record[0] != 2 * n + 2:
+            return None
+        if _COUNT.unpack_from(self._buf, offset)[0] != record[0]:
+            return None
+        return record[1:]
+
+    def latest(self):
+        """
+        Returns the most recent record as a (timestamp, value, ...) tuple,
+        or `None` if nothing has been written
+        """
+
+        while True:
+            count = self.count
+            if not count:
+                return None
+            record = self._record(count - 1)
+            if record is not None:
+                return record
+
+    def read(self, cursor=0):
+        """
+        Returns a tuple of (records, cursor): the list of (timestamp,
+        value, ...) tuples written since *cursor*, and the cursor to pass to
+        the next call. Start with a cursor of 0. Records overwritten before
+        they could be read are skipped; the number skipped is the difference
+        between the cursors less the number of records.
+        """
+
+        count = self.count
+        records = []
+        for n in range(max(cursor, count - self._capacity), count):
+            record = self._record(n)
+            if record is not None:
+                records.append(record)
+        return records, count
+
+
+def _attach(name):
+    """
+    Internal. Maps the existing shared memory block *name*. Before Python
+    3.13 attaching registers the block with the resource tracker, which
+    would remove it when this process exits, so registration is suppressed
+    """
+
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    from multiprocessing import resource_tracker
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name)
+    finally:
+        resource_tracker.register = register
@@ -0,0 +1,436 @@
+"""
+Multi-rate sampling of the Sense HAT sensors.
+
+A `Sampler` reads each sensor at its own rate from a single thread, so reads
+never contend for the I2C bus, and combines the latest reading of every
+sensor into time-aligned rows:
+
+    from sense_hat import SenseHat
+    from sense_hat.sampler import Sampler
+
+    sense = SenseHat()
+    with Sampler(sense, {'imu': 50, 'humidity': 1, 'pressure': 5}) as sampler:
+        sampler.add_listener(print, streams=['pressure'])
+        ...
+
+Components in one process can share a single sampler, rather than each
+polling the sensors, with `acquire` and `release`.
+"""
+
+import time
+import logging
+from threading import Thread, Event, Lock
+
+from . import registry
+
+
+# The fields each stream contributes to a row. IMU orientation is in
+# radians, as returned by `get_orientation_radians`
+STREAMS = {
+    'imu': (
+        'roll', 'pitch', 'yaw',
+        'compass_x', 'compass_y', 'compass_z',
+        'gyro_x', 'gyro_y', 'gyro_z',
+        'accel_x', 'accel_y', 'accel_z',
+    ),
+    'humidity': ('humidity', 'temperature_from_humidity'),
+    'pressure': ('pressure', 'temperature_from_pressure'),
+    'colour': ('red', 'green', 'blue', 'clear'),
+}
+
+# The stream each field belongs to
+FIELDS = {
+    field: stream
+    for stream, fields in STREAMS.items()
+    for field in fields
+}
+
+# Pairs of (valid key, data key) in the RTIMU data dictionary, in the order
+# of the 'imu' stream fields
+_IMU_KEYS = (
+    ('fusionPoseValid', 'fusionPose'),
+    ('compassValid', 'compass'),
+    ('gyroValid', 'gyro'),
+    ('accelValid', 'accel'),
+)
+
+
+def _read_imu(sense, last):
+    data = sense._poll_imu()
+    if data is None:
+        return None
+    values = list(last)
+    for index, (is_valid_key, data_key) in enumerate(_IMU_KEYS):
+        if data[is_valid_key]:
+            values[index * 3:index * 3 + 3] = data[data_key]
+    return values
+
+
+def _read_environment(reader):
+    def read(sense, last):
+        data = reader(sense)
+        return [
+            data[1] if data[0] else last[0],
+            data[3] if data[2] else last[1],
+        ]
+    return read
+
+
+def _read_colour(sense, last):
+    return list(sense.colour.colour_raw)
+
+
+_READERS = {
+    'imu': _read_imu,
+    'humidity': _read_environment(lambda sense: sense._read_humidity()),
+    'pressure': _read_environment(lambda sense: sense._read_pressure()),
+    'colour': _read_colour,
+}
+
+
+def add_rate_arguments(parser):
+    """
+    Adds a --STREAM-rate option for each stream to the `argparse` *parser*,
+    for command line tools built on a `Sampler`
+    """
+
+    for stream in STREAMS:
+        parser.add_argument('--%s-rate' % stream, type=float, metavar='HZ',
+            help='%s sampling rate; 0 disables it (default: the sensor\'s '
+            'native rate)' % stream)
+
+
+def rates_from_arguments(options, sense):
+    """
+    Returns the *rates* for a `Sampler` of *sense* given the *options* parsed
+    from the arguments added by `add_rate_arguments`
+    """
+
+    rates = {}
+    for stream in STREAMS:
+        rate = getattr(options, '%s_rate' % stream)
+        if rate == 0 or (stream == 'colour' and not sense.has_colour_sensor()):
+            continue
+        rates[stream] = rate
+    return rates
+
+
+class Sampler(object):
+    """
+    Samples the Sense HAT sensors named in *rates*, a dictionary mapping
+    stream names ('imu', 'humidity', 'pressure' and 'colour') to the desired
+    rate in Hz, or `None` to sample at the sensor's native rate. By default
+    every sensor present is sampled at its native rate.
+
+    Each sampling period is rounded to a whole number of the sensor's native
+    output periods, so a sensor is never read faster than it produces new
+    data and readings don't beat against the sensor's own updates.
+
+    Call `start` to sample in a background thread, or call `poll` from your
+    own loop.
+
+    A stream whose sensor can't be read is retried, waiting twice as long
+    after each consecutive failure (up to `MAX_RETRY_INTERVAL` seconds).
+    """
+
+    # The longest a failing stream waits before it is read again
+    MAX_RETRY_INTERVAL = 60
+
+    def __init__(self, sense, rates=None):
+        if rates is None:
+            rates = dict.fromkeys(('imu', 'humidity', 'pressure'))
+            if sense.has_colour_sensor():
+                rates['colour'] = None
+        for stream in rates:
+            if stream not in STREAMS:
+                raise ValueError('Unknown stream %r' % stream)
+        if 'colour' in rates and not sense.has_colour_sensor():
+            raise ValueError('This Sense HAT does not have a colour sensor')
+        self._sense = sense
+        self._periods = {
+            stream: self._aligned_period(stream, rate)
+            for stream, rate in rates.items()
+        }
+        self._deadlines = dict.fromkeys(self._periods, 0.0)
+        self._latest = {'timestamp': 0.0}
+        self._timestamps = dict.fromkeys(self._periods, 0.0)
+        # Consecutive failed reads of each stream
+        self._failures = dict.fromkeys(self._periods, 0)
+        for stream in self._periods:
+            self._latest.update(dict.fromkeys(STREAMS[stream], 0))
+        self._listeners = []
+        self._lock = Lock()
+        self._thread = None
+        self._starts = 0
+        # The registry key and rates of a sampler returned by acquire
+        self._shared = None
+        self._stop_event = Event()
+
+    def _native_period(self, stream):
+        """
+        Internal. Returns the interval in seconds at which *stream*'s sensor
+        produces new readings
+        """
+
+        if stream == 'imu':
+            self._sense._init_imu()
+            return self._sense._imu_poll_interval
+        elif stream == 'humidity':
+            return 1 / self._sense.HUMIDITY_RATE
+        elif stream == 'pressure':
+            return 1 / self._sense.PRESSURE_RATE
+        else:
+            return self._sense.colour.integration_time
+
+    def _aligned_period(self, stream, rate):
+        native = self._native_period(stream)
+        if not rate:
+            return native
+        return native * max(1, round(1 / (rate * native)))
+
+    def close(self):
+        self.stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.close()
+
+    @property
+    def periods(self):
+        """
+        A dictionary mapping each stream to its sampling period in seconds
+        """
+
+        return dict(self._periods)
+
+    @property
+    def running(self):
+        """
+        Returns True if the background sampling thread is running
+        """
+
+        return self._thread is not None
+
+    def start(self):
+        """
+        Starts sampling in a background thread. Calls may be nested: the
+        thread runs until `stop` has been called as many times as `start`
+        """
+
+        with self._lock:
+            self._starts += 1
+            if self._thread:
+                return
+            # Each thread has its own stop event, so a thread still stopping
+            # can't be revived by a new start
+            self._stop_event = Event()
+            self._thread = Thread(
+                target=self._run, args=(self._stop_event,))
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stops the background sampling thread once every `start` has been
+        matched by a call to `stop`
+        """
+
+        with self._lock:
+            if self._starts:
+                self._starts -= 1
+            if self._starts:
+                return
+        self._halt()
+
+    def _halt(self):
+        """
+        Internal. Stops the background sampling thread, if it is running,
+        however many times it was started
+        """
+
+        with self._lock:
+            self._starts = 0
+            thread, self._thread = self._thread, None
+            self._stop_event.set()
+        if thread:
+            thread.join()
+
+    def _run(self, stop_event):
+        while not stop_event.is_set():
+            delay = self.next_deadline() - time.monotonic()
+            if delay > 0:
+                stop_event.wait(delay)
+            else:
+                self.poll()
+
+    def next_deadline(self):
+        """
+        Returns the `time.monotonic` time at which the next stream is due to
+        be sampled
+        """
+
+        if not self._deadlines:
+            return float('inf')
+        return min(self._deadlines.values())
+
+    def poll(self):
+        """
+        Reads every stream that is due, then passes the resulting row to the
+        listeners whose streams were updated. Returns the row, or `None` if
+        no stream was due or no new readings were available.
+        """
+
+        now = time.monotonic()
+        due = [
+            stream for stream, deadline in self._deadlines.items()
+            if deadline <= now
+        ]
+        updated = set()
+        for stream in due:
+            period = self._periods[stream]
+            deadline = self._deadlines[stream] + period
+            # Resynchronise rather than read repeatedly to catch up
+            self._deadlines[stream] = deadline if deadline > now else now + period
+            fields = STREAMS[stream]
+            last = [self._latest[field] for field in fields]
+            try:
+                values = _READERS[stream](self._sense, last)
+            except Exception as e:
+                # Errors such as a busy I2C bus are usually transient, so
+                # keep sampling the stream, backing off while it fails
+                failures = self._failures[stream] = self._failures[stream] + 1
+                retry = min(
+                    period * 2 ** min(failures, 32),
+                    max(period, self.MAX_RETRY_INTERVAL))
+                self._deadlines[stream] = now + retry
+                logging.warning(
+                    'Failed to sample %s (%d in a row), retrying in %.3gs: %s',
+                    stream, failures, retry, e)
+                continue
+            self._failures[stream] = 0
+            if values is not None:
+                with self._lock:
+                    self._latest.update(zip(fields, values))
+                    self._timestamps[stream] = time.time()
+                updated.add(stream)
+        if not updated:
+            return None
+        with self._lock:
+            self._latest['timestamp'] = time.time()
+            row = dict(self._latest)
+        for listener, streams in list(self._listeners):
+            if streams is None or not streams.isdisjoint(updated):
+                try:
+                    listener(row)
+                except Exception:
+                    # One failing listener mustn't stop sampling for the rest
+                    logging.exception('Sampler listener failed')
+        return row
+
+    def latest(self):
+        """
+        Returns a dictionary holding the most recent reading of every field,
+        along with the 'timestamp' (as returned by `time.time`) of the most
+        recent update
+        """
+
+        with self._lock:
+            return dict(self._latest)
+
+    def timestamps(self):
+        """
+        Returns a dictionary mapping each stream to the time (as returned by
+        `time.time`) it was last successfully read, or 0 if it never has been
+        """
+
+        with self._lock:
+            return dict(self._timestamps)
+
+    def add_listener(self, listener, streams=None):
+        """
+        Arranges for *listener* to be called with each new row. If *streams*
+        is given, *listener* is only called when one of the named streams has
+        been updated. Listeners are called from the sampling thread, so they
+        should return quickly. Exceptions raised by listeners are logged.
+        """
+
+        if streams is not None:
+            streams = frozenset(streams)
+        self._listeners.append((listener, streams))
+
+    def remove_listener(self, listener):
+        """
+        Stops *listener* from being called with new rows
+        """
+
+        self._listeners = [
+            (fn, streams) for fn, streams in self._listeners
+            if fn != listener
+        ]
+
+    def add_trigger(self, trigger):
+        """
+        Evaluates *trigger* (see `sense_hat.triggers`) against each new
+        reading of the stream its condition watches. The trigger's callbacks
+        are called from the sampling thread.
+        """
+
+        if trigger.stream not in self._periods:
+            raise ValueError('Stream %r is not being sampled' % trigger.stream)
+        self.add_listener(trigger.update, streams=[trigger.stream])
+
+    def remove_trigger(self, trigger):
+        """
+        Stops evaluating *trigger*
+        """
+
+        self.remove_listener(trigger.update)
+
+
+def acquire(sense, rates=None):
+    """
+    Returns the process-wide `Sampler` of the Sense HAT used by *sense*, so
+    everything sampling the sensors in a process (a `DataLogger`, a `Broker`,
+    triggers and so on) polls them once. The first caller's *rates* create
+    the sampler; a later caller's *rates* must be the same, or `None` to
+    accept whatever the shared sampler samples.
+
+    The shared sampler has its own `SenseHat`, so it doesn't depend on
+    *sense* staying open. Start and stop it as usual (the calls nest), and
+    remove your listeners and triggers when you have finished with it. Every
+    call must be balanced by a call to `release`.
+    """
+
+    key = ('sampler', sense._imu_settings_file)
+
+    def create():
+        sampler = Sampler(type(sense)(sense._imu_settings_file), rates)
+        sampler._shared = (key, rates)
+        return sampler
+
+    sampler = registry.acquire(key, create, _close_shared)
+    if rates is not None and rates != sampler._shared[1]:
+        registry.release(key)
+        raise ValueError(
+            'The shared sampler was created with rates %r' %
+            (sampler._shared[1],))
+    return sampler
+
+
+def release(sampler):
+    """
+    Gives up a hold on the shared *sampler* returned by `acquire`. The last
+    hold to be released stops the sampler
+    """
+
+    if sampler._shared is None:
+        raise ValueError('The sampler was not returned by acquire')
+    registry.release(sampler._shared[0])
+
+
+def _close_shared(sampler):
+    sampler._halt()
+    sampler._sense.close()
@@ -1,23 +1,116 @@
 #!/usr/bin/python
-import logging
 import struct
 import os
 import sys
 import math
 import time
-import numpy as np
-import shutil
-import glob
-import RTIMU  # custom version
 import pwd
 import array
 import fcntl
-from PIL import Image  # pillow
-from copy import deepcopy
+import weakref
+from threading import RLock
 
 from .stick import SenseStick
 from .colour import ColourSensor
 from .exceptions import ColourSensorInitialisationError
+from .singleflight import SingleFlight
+from . import discovery
+from . import registry
+from . import stats
+from . import hooks
+
+
+# The RTIMU environmental reading returned when a sensor has never been read
+_NO_READING = (False, 0, False, 0)
+
+
+def _deadline(timeout):
+    """
+    Internal. Returns the time.monotonic time *timeout* seconds from now, or
+    None if *timeout* is None
+    """
+
+    if timeout is None:
+        return None
+    return time.monotonic() + timeout
+
+
+class _locked(object):
+    """
+    Internal. Context manager which holds *lock*, raising TimeoutError if it
+    cannot be acquired before *deadline* (a time.monotonic time, or None to
+    wait indefinitely)
+    """
+
+    def __init__(self, lock, deadline):
+        self._lock = lock
+        self._deadline = deadline
+
+    def __enter__(self):
+        if self._deadline is None:
+            self._lock.acquire()
+        elif not self._lock.acquire(
+                timeout=max(0, self._deadline - time.monotonic())):
+            raise TimeoutError('Timed out waiting for the sensor')
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self._lock.release()
+
+
+class _subsystem(object):
+    """
+    Internal. Decorates a SenseHat method which initialises a subsystem. The
+    method is called the first time the attribute of the same name is used
+    and its result replaces the attribute on the instance, so later accesses
+    cost nothing.
+    """
+
+    def __init__(self, init):
+        self._init = init
+        self._name = init.__name__
+        self.__doc__ = init.__doc__
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        with instance._subsystem_lock:
+            try:
+                return instance.__dict__[self._name]
+            except KeyError:
+                value = self._init(instance)
+                instance.__dict__[self._name] = value
+                return value
+
+
+class _SharedSensor(object):
+    """
+    Internal. An RTIMU sensor object along with the state every SenseHat
+    using it must share: the lock serialising access to it, whether it has
+    been initialised and the most recent (time, reading) pair
+    """
+
+    def __init__(self, device):
+        self.device = device
+        self.lock = RLock()
+        self.reads = SingleFlight()
+        self.init = False  # Will be initialised as and when needed
+        self.reading = None
+
+
+class _SharedIMU(_SharedSensor):
+    """
+    Internal. The shared state of the IMU, which also includes its poll
+    interval and which of its sensors are enabled
+    """
+
+    def __init__(self, device):
+        super(_SharedIMU, self).__init__(device)
+        self.poll_interval = None
+        self.readings = {}  # (time, reading) pairs by IMU configuration
+        self.compass_enabled = False
+        self.gyro_enabled = False
+        self.accel_enabled = False
+
 
 class SenseHat(object):
 
@@ -29,19 +122,121 @@ class SenseHat(object):
     SENSE_HAT_FB_GAMMA_LOW = 1
     SENSE_HAT_FB_GAMMA_USER = 2
     SETTINGS_HOME_PATH = '.config/sense_hat'
+    # Output data rates (Hz) RTIMULib configures the HTS221 and LPS25H for
+    HUMIDITY_RATE = 12.5
+    PRESSURE_RATE = 25.0
+
+    # The attributes initialised by each subsystem that may be preloaded
+    SUBSYSTEMS = {
+        'leds': ('_fb_device', '_pix_map'),
+        'text': ('_text_dict',),
+        'imu': ('_imu',),
+        'pressure': ('_pressure',),
+        'humidity': ('_humidity',),
+        'stick': ('_stick',),
+        'colour': ('_colour',),
+    }
 
     def __init__(
             self,
             imu_settings_file='RTIMULib',
-            text_assets='sense_hat_text'
+            text_assets='sense_hat_text',
+            preload=None
         ):
 
-        self._fb_device = self._get_fb_device()
-        if self._fb_device is None:
+        # Each subsystem is initialised the first time it is used, unless it
+        # is named in preload. Devices are shared with every other SenseHat
+        # in the process through the registry, and released on close
+        self._subsystem_lock = RLock()
+        self._handles = []
+        self._release = weakref.finalize(
+            self, registry.release_all, self._handles)
+        self._imu_settings_file = imu_settings_file
+        self._text_assets = text_assets
+        self._rotation = 0
+        # Seconds for which the environmental properties reuse a reading;
+        # None reuses a reading until its sensor has produced a new one
+        self.environment_ttl = None
+        self._last_orientation = {'pitch': 0, 'roll': 0, 'yaw': 0}
+        raw = {'x': 0, 'y': 0, 'z': 0}
+        self._last_compass_raw = dict(raw)
+        self._last_gyro_raw = dict(raw)
+        self._last_accel_raw = dict(raw)
+
+        for name in preload or ():
+            try:
+                attrs = self.SUBSYSTEMS[name]
+            except KeyError:
+                raise ValueError('Unknown subsystem %r' % name)
+            for attr in attrs:
+                getattr(self, attr)
+
+    def close(self):
+        """
+        Releases the devices used by this object, closing them if no other
+        object in the process is using them. The object must not be used
+        afterwards
+        """
+
+        with self._subsystem_lock:
+            for name in ('_stick', '_colour'):
+                device = self.__dict__.pop(name, None)
+                if device is not None:
+                    device.close()
+            self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.close()
+
+    def stats(self, reset=False):
+        """
+        Returns a dictionary of counters and latency histograms for each
+        hardware operation performed in this process, keyed by operation
+        name. If *reset* is True the statistics are cleared as they are
+        returned
+        """
+
+        return stats.snapshot(reset)
+
+    def reset_stats(self):
+        """
+        Clears the statistics returned by stats
+        """
+
+        stats.reset()
+
+    ####
+    # Subsystems
+    ####
+
+    def _acquire(self, key, factory):
+        """
+        Internal. Acquires the shared handle for *key* from the registry,
+        to be released when this object is closed
+        """
+
+        handle = registry.acquire(key, factory)
+        self._handles.append(key)
+        return handle
+
+    @_subsystem
+    def _fb_lock(self):
+        # Serialises access to the framebuffer across every SenseHat
+        return self._acquire(('fb',), RLock)
+
+    @_subsystem
+    def _fb_device(self):
+        fb_device = self._get_fb_device()
+        if fb_device is None:
             raise OSError('Cannot detect %s device' % self.SENSE_HAT_FB_NAME)
+        return fb_device
 
-        if not glob.glob('/dev/i2c*'):
-            raise OSError('Cannot access I2C. Please ensure I2C is enabled in raspi-config')
+    @_subsystem
+    def _pix_map(self):
+        import numpy as np
 
         # 0 is With B+ HDMI port facing downwards
         pix_map0 = np.array([
@@ -59,46 +254,93 @@ class SenseHat(object):
         pix_map180 = np.rot90(pix_map90)
         pix_map270 = np.rot90(pix_map180)
 
-        self._pix_map = {
+        return {
               0: pix_map0,
              90: pix_map90,
             180: pix_map180,
             270: pix_map270
         }
 
-        self._rotation = 0
-
-        # Load text assets
+    @_subsystem
+    def _text_dict(self):
         dir_path = os.path.dirname(__file__)
-        self._load_text_assets(
-            os.path.join(dir_path, '%s.png' % text_assets),
-            os.path.join(dir_path, '%s.txt' % text_assets)
+        return self._load_text_assets(
+            os.path.join(dir_path, '%s.png' % self._text_assets),
+            os.path.join(dir_path, '%s.txt' % self._text_assets)
         )
 
+    @_subsystem
+    def _imu_settings(self):
+        import glob
+
+        if not glob.glob('/dev/i2c*'):
+            raise OSError('Cannot access I2C. Please ensure I2C is enabled in raspi-config')
+
         # Load IMU settings and calibration data
-        self._imu_settings = self._get_settings_file(imu_settings_file)
-        self._imu = RTIMU.RTIMU(self._imu_settings)
-        self._imu_init = False  # Will be initialised as and when needed
-        self._pressure = RTIMU.RTPressure(self._imu_settings)
-        self._pressure_init = False  # Will be initialised as and when needed
-        self._humidity = RTIMU.RTHumidity(self._imu_settings)
-        self._humidity_init = False  # Will be initialised as and when needed
-        self._last_orientation = {'pitch': 0, 'roll': 0, 'yaw': 0}
-        raw = {'x': 0, 'y': 0, 'z': 0}
-        self._last_compass_raw = deepcopy(raw)
-        self._last_gyro_raw = deepcopy(raw)
-        self._last_accel_raw = deepcopy(raw)
-        self._compass_enabled = False
-        self._gyro_enabled = False
-        self._accel_enabled = False
-        self._stick = SenseStick()
+        return self._get_settings_file(self._imu_settings_file)
+
+    @_subsystem
+    def _imu_sensor(self):
+        import RTIMU  # custom version
 
+        return self._acquire(
+            ('imu', self._imu_settings_file),
+            lambda: _SharedIMU(RTIMU.RTIMU(self._imu_settings)))
+
+    @_subsystem
+    def _pressure_sensor(self):
+        import RTIMU  # custom version
+
+        return self._acquire(
+            ('pressure', self._imu_settings_file),
+            lambda: _SharedSensor(RTIMU.RTPressure(self._imu_settings)))
+
+    @_subsystem
+    def _humidity_sensor(self):
+        import RTIMU  # custom version
+
+        return self._acquire(
+            ('humidity', self._imu_settings_file),
+            lambda: _SharedSensor(RTIMU.RTHumidity(self._imu_settings)))
+
+    @_subsystem
+    def _imu(self):
+        return self._imu_sensor.device
+
+    @_subsystem
+    def _imu_lock(self):
+        return self._imu_sensor.lock
+
+    @_subsystem
+    def _pressure(self):
+        return self._pressure_sensor.device
+
+    @_subsystem
+    def _pressure_lock(self):
+        return self._pressure_sensor.lock
+
+    @_subsystem
+    def _humidity(self):
+        return self._humidity_sensor.device
+
+    @_subsystem
+    def _humidity_lock(self):
+        return self._humidity_sensor.lock
+
+    @_subsystem
+    def _stick(self):
+        return SenseStick()
+
+    @_subsystem
+    def _colour(self):
         # initialise the TCS34725 colour sensor (if possible)
         try:
-            self._colour = ColourSensor()
+            return ColourSensor()
         except Exception as e:
+            import logging
+
             logging.debug(e)
-            pass
+            return None
 
     ####
     # Text assets
@@ -119,12 +361,13 @@ class SenseHat(object):
         text_pixels = self.load_image(text_image_file, False)
         with open(text_file, 'r') as f:
             loaded_text = f.read()
-        self._text_dict = {}
+        text_dict = {}
         for index, s in enumerate(loaded_text):
             start = index * 40
             end = start + 40
             char = text_pixels[start:end]
-            self._text_dict[s] = char
+            text_dict[s] = char
+        return text_dict
 
     def _trim_whitespace(self, char):  # For loading text assets only
         """
@@ -154,6 +397,9 @@ class SenseHat(object):
         copied to the home folder if one is not already found there.
         """
 
+        import shutil
+        import RTIMU  # custom version
+
         ini_file = '%s.ini' % imu_settings_file
 
         home_dir = pwd.getpwuid(os.getuid())[5]
@@ -174,9 +420,27 @@ class SenseHat(object):
     def _get_fb_device(self):
         """
         Internal. Finds the correct frame buffer device for the sense HAT
-        and returns its /dev name.
+        and returns its /dev name. The result is cached until the next reboot
         """
 
+        return discovery.lookup('fb', self._find_fb_device, self._is_fb_device)
+
+    def _is_fb_device(self, fb_device):
+        """
+        Internal. Returns True if *fb_device* is the sense HAT frame buffer
+        """
+
+        name = discovery.read_name(os.path.join(
+            '/sys/class/graphics', os.path.basename(fb_device), 'name'))
+        return name == self.SENSE_HAT_FB_NAME and os.path.exists(fb_device)
+
+    def _find_fb_device(self):
+        """
+        Internal. Searches sysfs for the sense HAT frame buffer
+        """
+
+        import glob
+
         device = None
 
         for fb in glob.glob('/sys/class/graphics/fb*'):
@@ -200,26 +464,41 @@ class SenseHat(object):
     def stick(self):
         return self._stick
 
+    ####
+    # Event loop
+    ####
+
+    @_subsystem
+    def loop(self):
+        """
+        The `EventLoop` run by `run`, which runs the joystick callbacks,
+        samplers, animations and timers in a single thread
+        """
+        from .loop import EventLoop
+
+        return EventLoop(self)
+
+    def run(self, timeout=None):
+        """
+        Runs `loop` in the calling thread until its `stop` method is called
+        or, if *timeout* is given, for *timeout* seconds
+        """
+        self.loop.run(timeout)
+
     ####
     # Colour sensor
     ####
 
     @property
     def colour(self):
-        try:
-            return self._colour
-        except AttributeError:
+        if self._colour is None:
             print('This Sense Hat does not have a colour sensor')
+        return self._colour
 
     color = colour
 
     def has_colour_sensor(self):
-        try:
-            self._colour
-        except:
-            return False
-        else:
-            return True
+        return self._colour is not None
 
     ####
     # LED Matrix
@@ -240,11 +519,12 @@ class SenseHat(object):
         """
 
         if r in self._pix_map.keys():
-            if redraw:
-                pixel_list = self.get_pixels()
-            self._rotation = r
-            if redraw:
-                self.set_pixels(pixel_list)
+            with self._fb_lock:
+                if redraw:
+                    pixel_list = self.get_pixels()
+                self._rotation = r
+                if redraw:
+                    self.set_pixels(pixel_list)
         else:
             raise ValueError('Rotation must be 0, 90, 180 or 270 degrees')
 
@@ -276,13 +556,14 @@ class SenseHat(object):
         Flip LED matrix horizontal
         """
 
-        pixel_list = self.get_pixels()
-        flipped = []
-        for i in range(8):
-            offset = i * 8
-            flipped.extend(reversed(pixel_list[offset:offset + 8]))
-        if redraw:
-            self.set_pixels(flipped)
+        with self._fb_lock:
+            pixel_list = self.get_pixels()
+            flipped = []
+            for i in range(8):
+                offset = i * 8
+                flipped.extend(reversed(pixel_list[offset:offset + 8]))
+            if redraw:
+                self.set_pixels(flipped)
         return flipped
 
     def flip_v(self, redraw=True):
@@ -290,13 +571,14 @@ class SenseHat(object):
         Flip LED matrix vertical
         """
 
-        pixel_list = self.get_pixels()
-        flipped = []
-        for i in reversed(range(8)):
-            offset = i * 8
-            flipped.extend(pixel_list[offset:offset + 8])
-        if redraw:
-            self.set_pixels(flipped)
+        with self._fb_lock:
+            pixel_list = self.get_pixels()
+            flipped = []
+            for i in reversed(range(8)):
+                offset = i * 8
+                flipped.extend(pixel_list[offset:offset + 8])
+            if redraw:
+                self.set_pixels(flipped)
         return flipped
 
     def set_pixels(self, pixel_list):
@@ -306,6 +588,14 @@ class SenseHat(object):
         and 255
         """
 
+        self._set_pixels(pixel_list)
+
+    def _set_pixels(self, pixel_list, rotation_offset=0):
+        """
+        Internal. Implements set_pixels, drawing with the pixel map rotated
+        *rotation_offset* degrees from the current rotation
+        """
+
         if len(pixel_list) != 64:
             raise ValueError('Pixel lists must have 64 elements')
 
@@ -317,12 +607,15 @@ class SenseHat(object):
                 if element > 255 or element < 0:
                     raise ValueError('Pixel at index %d is invalid. Pixel elements must be between 0 and 255' % index)
 
-        with open(self._fb_device, 'wb') as f:
-            map = self._pix_map[self._rotation]
+        with self._fb_lock, open(self._fb_device, 'wb') as f:
+            start = hooks.begin('fb_write', self._fb_device, 128)
+            map = self._pix_map[(self._rotation + rotation_offset) % 360]
             for index, pix in enumerate(pixel_list):
                 # Two bytes per pixel in fb memory, 16 bit RGB565
                 f.seek(map[index // 8][index % 8] * 2)  # row, column
                 f.write(self._pack_bin(pix))
+            f.flush()
+            hooks.end('fb_write', self._fb_device, 128, start)
 
     def get_pixels(self):
         """
@@ -331,13 +624,15 @@ class SenseHat(object):
         """
 
         pixel_list = []
-        with open(self._fb_device, 'rb') as f:
+        with self._fb_lock, open(self._fb_device, 'rb') as f:
+            start = hooks.begin('fb_read', self._fb_device, 128)
             map = self._pix_map[self._rotation]
             for row in range(8):
                 for col in range(8):
                     # Two bytes per pixel in fb memory, 16 bit RGB565
                     f.seek(map[row][col] * 2)  # row, column
                     pixel_list.append(self._unpack_bin(f.read(2)))
+            hooks.end('fb_read', self._fb_device, 128, start)
         return pixel_list
 
     def set_pixel(self, x, y, *args):
@@ -372,11 +667,14 @@ class SenseHat(object):
             if element > 255 or element < 0:
                 raise ValueError('Pixel elements must be between 0 and 255')
 
-        with open(self._fb_device, 'wb') as f:
+        with self._fb_lock, open(self._fb_device, 'wb') as f:
+            start = hooks.begin('fb_write', self._fb_device, 2)
             map = self._pix_map[self._rotation]
             # Two bytes per pixel in fb memory, 16 bit RGB565
             f.seek(map[y][x] * 2)  # row, column
             f.write(self._pack_bin(pixel))
+            f.flush()
+            hooks.end('fb_write', self._fb_device, 2, start)
 
     def get_pixel(self, x, y):
         """
@@ -392,11 +690,13 @@ class SenseHat(object):
 
         pix = None
 
-        with open(self._fb_device, 'rb') as f:
+        with self._fb_lock, open(self._fb_device, 'rb') as f:
+            start = hooks.begin('fb_read', self._fb_device, 2)
             map = self._pix_map[self._rotation]
             # Two bytes per pixel in fb memory, 16 bit RGB565
             f.seek(map[y][x] * 2)  # row, column
             pix = self._unpack_bin(f.read(2))
+            hooks.end('fb_read', self._fb_device, 2, start)
 
         return pix
 
@@ -409,6 +709,8 @@ class SenseHat(object):
         if not os.path.exists(file_path):
             raise IOError('%s not found' % file_path)
 
+        from PIL import Image  # pillow
+
         img = Image.open(file_path).convert('RGB')
         pixel_list = list(map(list, img.getdata()))
 
@@ -467,10 +769,17 @@ class SenseHat(object):
 
         # We must rotate the pixel map left through 90 degrees when drawing
         # text, see _load_text_assets
-        previous_rotation = self._rotation
-        self._rotation -= 90
-        if self._rotation < 0:
-            self._rotation = 270
+        for frame in self._message_frames(text_string, text_colour, back_colour):
+            self._set_pixels(frame, -90)
+            time.sleep(scroll_speed)
+
+    def _message_frames(self, text_string, text_colour, back_colour):
+        """
+        Internal. Returns the frames of pixels for scrolling *text_string*
+        across the LED matrix, to be drawn with the pixel map rotated -90
+        degrees
+        """
+
         dummy_colour = [None, None, None]
         string_padding = [dummy_colour] * 64
         letter_padding = [dummy_colour] * 8
@@ -488,12 +797,10 @@ class SenseHat(object):
         ]
         # Shift right by 8 pixels per frame to scroll
         scroll_length = len(coloured_pixels) // 8
-        for i in range(scroll_length - 8):
-            start = i * 8
-            end = start + 64
-            self.set_pixels(coloured_pixels[start:end])
-            time.sleep(scroll_speed)
-        self._rotation = previous_rotation
+        return [
+            coloured_pixels[i * 8:i * 8 + 64]
+            for i in range(scroll_length - 8)
+        ]
 
     def show_letter(
             self,
@@ -510,10 +817,6 @@ class SenseHat(object):
             raise ValueError('Only one character may be passed into this method')
         # We must rotate the pixel map left through 90 degrees when drawing
         # text, see _load_text_assets
-        previous_rotation = self._rotation
-        self._rotation -= 90
-        if self._rotation < 0:
-            self._rotation = 270
         dummy_colour = [None, None, None]
         pixel_list = [dummy_colour] * 8
         pixel_list.extend(self._get_char_pixels(s))
@@ -522,13 +825,12 @@ class SenseHat(object):
             text_colour if pixel == [255, 255, 255] else back_colour
             for pixel in pixel_list
         ]
-        self.set_pixels(coloured_pixels)
-        self._rotation = previous_rotation
+        self._set_pixels(coloured_pixels, -90)
 
     @property
     def gamma(self):
         buffer = array.array('B', [0]*32)
-        with open(self._fb_device) as f:
+        with self._fb_lock, open(self._fb_device) as f:
             fcntl.ioctl(f, self.SENSE_HAT_FB_FBIOGET_GAMMA, buffer)
         return list(buffer)
 
@@ -543,7 +845,7 @@ class SenseHat(object):
         if not isinstance(buffer, array.array):
             buffer = array.array('B', buffer)
 
-        with open(self._fb_device) as f:
+        with self._fb_lock, open(self._fb_device) as f:
             fcntl.ioctl(f, self.SENSE_HAT_FB_FBIOSET_GAMMA, buffer)
 
     def gamma_reset(self):
@@ -551,7 +853,7 @@ class SenseHat(object):
         Resets the LED matrix gamma correction to default
         """
 
-        with open(self._fb_device) as f:
+        with self._fb_lock, open(self._fb_device) as f:
             fcntl.ioctl(f, self.SENSE_HAT_FB_FBIORESET_GAMMA, self.SENSE_HAT_FB_GAMMA_DEFAULT)
 
     @property
@@ -560,7 +862,7 @@ class SenseHat(object):
 
     @low_light.setter
     def low_light(self, value):
-        with open(self._fb_device) as f:
+        with self._fb_lock, open(self._fb_device) as f:
             cmd = self.SENSE_HAT_FB_GAMMA_LOW if value else self.SENSE_HAT_FB_GAMMA_DEFAULT
             fcntl.ioctl(f, self.SENSE_HAT_FB_FBIORESET_GAMMA, cmd)
 
@@ -573,91 +875,219 @@ class SenseHat(object):
         Internal. Initialises the humidity sensor via RTIMU
         """
 
-        if not self._humidity_init:
-            self._humidity_init = self._humidity.humidityInit()
-            if not self._humidity_init:
-                raise OSError('Humidity Init Failed')
+        humidity = self._humidity_sensor
+        with humidity.lock:
+            if not humidity.init:
+                humidity.init = humidity.device.humidityInit()
+                if not humidity.init:
+                    raise OSError('Humidity Init Failed')
 
     def _init_pressure(self):
         """
         Internal. Initialises the pressure sensor via RTIMU
         """
 
-        if not self._pressure_init:
-            self._pressure_init = self._pressure.pressureInit()
-            if not self._pressure_init:
-                raise OSError('Pressure Init Failed')
+        pressure = self._pressure_sensor
+        with pressure.lock:
+            if not pressure.init:
+                pressure.init = pressure.device.pressureInit()
+                if not pressure.init:
+                    raise OSError('Pressure Init Failed')
 
-    def get_humidity(self):
+    def _read_humidity(self, max_age=0, timeout=None):
         """
-        Returns the percentage of relative humidity
+        Internal. Returns the RTIMU tuple of (humidity valid, humidity,
+        temperature valid, temperature), reading the humidity sensor unless
+        the last reading is no more than *max_age* seconds old. The last
+        reading is also returned if the sensor cannot be read within
+        *timeout* seconds
+        """
+
+        humidity = self._humidity_sensor
+        reading = humidity.reading
+        if max_age and reading and time.monotonic() - reading[0] <= max_age:
+            return reading[1]
+        try:
+            return humidity.reads.do(
+                'humidity', self._read_humidity_sensor, _deadline(timeout),
+                timeout=timeout)
+        except TimeoutError:
+            reading = humidity.reading
+            return reading[1] if reading else _NO_READING
+
+    def _read_humidity_sensor(self, deadline=None):
+        """
+        Internal. Reads the humidity sensor, recording when it was read.
+        Raises TimeoutError if the sensor is still busy at *deadline*
+        """
+
+        with _locked(self._humidity_lock, deadline):
+            self._init_humidity()  # Ensure humidity sensor is initialised
+            start = hooks.begin('humidity_read', 'humidity')
+            data = self._humidity.humidityRead()
+            hooks.end('humidity_read', 'humidity', None, start)
+            self._humidity_sensor.reading = (time.monotonic(), data)
+        return data
+
+    def _read_pressure(self, max_age=0, timeout=None):
+        """
+        Internal. Returns the RTIMU tuple of (pressure valid, pressure,
+        temperature valid, temperature), reading the pressure sensor unless
+        the last reading is no more than *max_age* seconds old. The last
+        reading is also returned if the sensor cannot be read within
+        *timeout* seconds
+        """
+
+        pressure = self._pressure_sensor
+        reading = pressure.reading
+        if max_age and reading and time.monotonic() - reading[0] <= max_age:
+            return reading[1]
+        try:
+            return pressure.reads.do(
+                'pressure', self._read_pressure_sensor, _deadline(timeout),
+                timeout=timeout)
+        except TimeoutError:
+            reading = pressure.reading
+            return reading[1] if reading else _NO_READING
+
+    def _read_pressure_sensor(self, deadline=None):
+        """
+        Internal. Reads the pressure sensor, recording when it was read.
+        Raises TimeoutError if the sensor is still busy at *deadline*
+        """
+
+        with _locked(self._pressure_lock, deadline):
+            self._init_pressure()  # Ensure pressure sensor is initialised
+            start = hooks.begin('pressure_read', 'pressure')
+            data = self._pressure.pressureRead()
+            hooks.end('pressure_read', 'pressure', None, start)
+            self._pressure_sensor.reading = (time.monotonic(), data)
+        return data
+
+    def _environment_ttl(self, rate):
+        """
+        Internal. Returns how long the properties may reuse a reading from
+        a sensor producing *rate* readings per second
+        """
+
+        if self.environment_ttl is None:
+            return 1 / rate
+        return self.environment_ttl
+
+    def _humidity_ttl(self):
+        return self._environment_ttl(self.HUMIDITY_RATE)
+
+    def _pressure_ttl(self):
+        return self._environment_ttl(self.PRESSURE_RATE)
+
+    def get_humidity(self, max_age=0, timeout=None):
+        """
+        Returns the percentage of relative humidity. If the last reading is
+        no more than *max_age* seconds old it is returned without reading the
+        sensor. If the sensor cannot be read within *timeout* seconds (e.g.
+        because another thread is using it) the last reading is returned
         """
 
-        self._init_humidity()  # Ensure humidity sensor is initialised
         humidity = 0
-        data = self._humidity.humidityRead()
+        data = self._read_humidity(max_age, timeout)
         if (data[0]):  # Humidity valid
             humidity = data[1]
         return humidity
 
     @property
     def humidity(self):
-        return self.get_humidity()
+        data = self._read_humidity(self._humidity_ttl())
+        return data[1] if data[0] else 0
 
-    def get_temperature_from_humidity(self):
+    def get_temperature_from_humidity(self, max_age=0, timeout=None):
         """
-        Returns the temperature in Celsius from the humidity sensor
+        Returns the temperature in Celsius from the humidity sensor. See
+        get_humidity for *max_age* and *timeout*
         """
 
-        self._init_humidity()  # Ensure humidity sensor is initialised
         temp = 0
-        data = self._humidity.humidityRead()
+        data = self._read_humidity(max_age, timeout)
         if (data[2]):  # Temp valid
             temp = data[3]
         return temp
 
-    def get_temperature_from_pressure(self):
+    def get_temperature_from_pressure(self, max_age=0, timeout=None):
         """
-        Returns the temperature in Celsius from the pressure sensor
+        Returns the temperature in Celsius from the pressure sensor. See
+        get_humidity for *max_age* and *timeout*
         """
 
-        self._init_pressure()  # Ensure pressure sensor is initialised
         temp = 0
-        data = self._pressure.pressureRead()
+        data = self._read_pressure(max_age, timeout)
         if (data[2]):  # Temp valid
             temp = data[3]
         return temp
 
-    def get_temperature(self):
+    def get_temperature(self, max_age=0, timeout=None):
         """
         Returns the temperature in Celsius
         """
 
-        return self.get_temperature_from_humidity()
+        return self.get_temperature_from_humidity(max_age, timeout)
 
     @property
     def temp(self):
-        return self.get_temperature_from_humidity()
+        return self.temperature
 
     @property
     def temperature(self):
-        return self.get_temperature_from_humidity()
+        data = self._read_humidity(self._humidity_ttl())
+        return data[3] if data[2] else 0
 
-    def get_pressure(self):
+    def get_pressure(self, max_age=0, timeout=None):
         """
-        Returns the pressure in Millibars
+        Returns the pressure in Millibars. See get_humidity for *max_age* and
+        *timeout*
         """
 
-        self._init_pressure()  # Ensure pressure sensor is initialised
         pressure = 0
-        data = self._pressure.pressureRead()
+        data = self._read_pressure(max_age, timeout)
         if (data[0]):  # Pressure valid
             pressure = data[1]
         return pressure
 
     @property
     def pressure(self):
-        return self.get_pressure()
+        data = self._read_pressure(self._pressure_ttl())
+        return data[1] if data[0] else 0
+
+    def _get_environment(
+            self, humidity_max_age, pressure_max_age, timeout=None):
+        """
+        Internal. Builds the dictionary returned by get_environment from one
+        reading of each environmental sensor
+        """
+
+        deadline = _deadline(timeout)
+        humidity = self._read_humidity(humidity_max_age, timeout)
+        if deadline is not None:
+            timeout = max(0, deadline - time.monotonic())
+        pressure = self._read_pressure(pressure_max_age, timeout)
+        return {
+            'humidity': humidity[1] if humidity[0] else 0,
+            'temperature_from_humidity': humidity[3] if humidity[2] else 0,
+            'pressure': pressure[1] if pressure[0] else 0,
+            'temperature_from_pressure': pressure[3] if pressure[2] else 0,
+        }
+
+    def get_environment(self, max_age=0, timeout=None):
+        """
+        Returns a dictionary containing the humidity, pressure and both
+        temperatures, taken from a single reading of the humidity sensor and
+        a single reading of the pressure sensor. See get_humidity for
+        *max_age* and *timeout*, which covers both readings
+        """
+
+        return self._get_environment(max_age, max_age, timeout)
+
+    @property
+    def environment(self):
+        return self._get_environment(self._humidity_ttl(), self._pressure_ttl())
 
     ####
     # IMU Sensor
@@ -668,14 +1098,20 @@ class SenseHat(object):
         Internal. Initialises the IMU sensor via RTIMU
         """
 
-        if not self._imu_init:
-            self._imu_init = self._imu.IMUInit()
-            if self._imu_init:
-                self._imu_poll_interval = self._imu.IMUGetPollInterval() * 0.001
-                # Enable everything on IMU
-                self.set_imu_config(True, True, True)
-            else:
-                raise OSError('IMU Init Failed')
+        imu = self._imu_sensor
+        with imu.lock:
+            if not imu.init:
+                imu.init = imu.device.IMUInit()
+                if imu.init:
+                    imu.poll_interval = imu.device.IMUGetPollInterval() * 0.001
+                    # Enable everything on IMU
+                    self.set_imu_config(True, True, True)
+                else:
+                    raise OSError('IMU Init Failed')
+
+    @property
+    def _imu_poll_interval(self):
+        return self._imu_sensor.poll_interval
 
     def set_imu_config(self, compass_enabled, gyro_enabled, accel_enabled):
         """
@@ -687,68 +1123,160 @@ class SenseHat(object):
         # the IMU consistently fails to read. So prevent unnecessary calls to
         # IMU config functions using state variables
 
-        self._init_imu()  # Ensure imu is initialised
-
         if (not isinstance(compass_enabled, bool)
         or not isinstance(gyro_enabled, bool)
         or not isinstance(accel_enabled, bool)):
             raise TypeError('All set_imu_config parameters must be of boolean type')
 
-        if self._compass_enabled != compass_enabled:
-            self._compass_enabled = compass_enabled
-            self._imu.setCompassEnable(self._compass_enabled)
+        imu = self._imu_sensor
+        with imu.lock:
+            self._init_imu()  # Ensure imu is initialised
+
+            if imu.compass_enabled != compass_enabled:
+                imu.compass_enabled = compass_enabled
+                imu.device.setCompassEnable(imu.compass_enabled)
 
-        if self._gyro_enabled != gyro_enabled:
-            self._gyro_enabled = gyro_enabled
-            self._imu.setGyroEnable(self._gyro_enabled)
+            if imu.gyro_enabled != gyro_enabled:
+                imu.gyro_enabled = gyro_enabled
+                imu.device.setGyroEnable(imu.gyro_enabled)
 
-        if self._accel_enabled != accel_enabled:
-            self._accel_enabled = accel_enabled
-            self._imu.setAccelEnable(self._accel_enabled)
+            if imu.accel_enabled != accel_enabled:
+                imu.accel_enabled = accel_enabled
+                imu.device.setAccelEnable(imu.accel_enabled)
 
-    def _read_imu(self):
+    def _read_imu(self, deadline=None):
         """
-        Internal. Tries to read the IMU sensor three times before giving up
+        Internal. Tries to read the IMU sensor every poll interval until it
+        has a new reading, giving up at *deadline* (by default, three poll
+        intervals from now)
         """
 
-        self._init_imu()  # Ensure imu is initialised
+        with self._imu_lock:
+            self._init_imu()  # Ensure imu is initialised
 
-        attempts = 0
-        success = False
+            interval = self._imu_poll_interval
+            if deadline is None:
+                deadline = time.monotonic() + 3 * interval
+            attempts = 0
 
-        while not success and attempts < 3:
-            success = self._imu.IMURead()
-            attempts += 1
-            time.sleep(self._imu_poll_interval)
+            while True:
+                success = self._imu_read_attempt()
+                attempts += 1
+                remaining = deadline - time.monotonic()
+                if success or remaining <= 0:
+                    break
+                time.sleep(min(interval, remaining))
 
+        if attempts > 1:
+            stats.count('imu_read', 'retries', attempts - 1)
+        if not success:
+            stats.count('imu_read', 'failures')
         return success
 
-    def _get_raw_data(self, is_valid_key, data_key):
+    def _imu_read_attempt(self):
+        """
+        Internal. Calls IMURead once, recording how long it took and whether
+        it had a new reading. The caller must hold the IMU lock
+        """
+
+        start = hooks.begin('imu_read', 'imu')
+        success = self._imu.IMURead()
+        hooks.end('imu_read', 'imu', None, start)
+        if not success:
+            stats.count('imu_read', 'misses')
+        return success
+
+    def _poll_imu(self):
+        """
+        Internal. Makes a single attempt to read the IMU without waiting for
+        the poll interval. Returns the RTIMU data dictionary, or None if no
+        new reading was available
+        """
+
+        with self._imu_lock:
+            self._init_imu()  # Ensure imu is initialised
+
+            if self._imu_read_attempt():
+                data = self._imu.getIMUData()
+                self._imu_sensor.readings[None] = (time.monotonic(), data)
+                return data
+        return None
+
+    def _read_imu_data(self, config=None, max_age=0, timeout=None):
+        """
+        Internal. Reads the IMU, first passing *config* (a tuple of
+        set_imu_config arguments) to set_imu_config if given. Returns the
+        RTIMU data dictionary, or None if the IMU could not be read within
+        *timeout* seconds. The last reading with the same *config* is
+        returned instead if it is no more than *max_age* seconds old.
+        Concurrent reads with the same *config* share a single IMU read
+        """
+
+        imu = self._imu_sensor
+        reading = imu.readings.get(config)
+        if max_age and reading and time.monotonic() - reading[0] <= max_age:
+            return reading[1]
+        try:
+            return imu.reads.do(
+                ('imu', config), self._read_imu_sensor, config,
+                _deadline(timeout), timeout=timeout)
+        except TimeoutError:
+            return None
+
+    def _read_imu_sensor(self, config, deadline=None):
+        """
+        Internal. Implements _read_imu_data. The configuration is applied
+        while holding the lock so another thread cannot reconfigure the IMU
+        between configuration and read. Raises TimeoutError if there is no
+        new reading by *deadline*
+        """
+
+        with _locked(self._imu_lock, deadline):
+            if config is not None:
+                self.set_imu_config(*config)
+            if self._read_imu(deadline):
+                data = self._imu.getIMUData()
+                self._imu_sensor.readings[config] = (time.monotonic(), data)
+                return data
+        if deadline is not None:
+            raise TimeoutError('Timed out waiting for the IMU')
+        return None
+
+    def _get_raw_data(
+            self, is_valid_key, data_key, config=None, max_age=0,
+            timeout=None):
         """
         Internal. Returns the specified raw data from the IMU when valid
         """
 
         result = None
 
-        if self._read_imu():
-            data = self._imu.getIMUData()
-            if data[is_valid_key]:
-                raw = data[data_key]
-                result = {
-                    'x': raw[0],
-                    'y': raw[1],
-                    'z': raw[2]
-                }
+        data = self._read_imu_data(config, max_age, timeout)
+        if data is not None and data[is_valid_key]:
+            raw = data[data_key]
+            result = {
+                'x': raw[0],
+                'y': raw[1],
+                'z': raw[2]
+            }
 
         return result
 
-    def get_orientation_radians(self):
+    def get_orientation_radians(self, max_age=0, timeout=None):
         """
         Returns a dictionary object to represent the current orientation in
-        radians using the aircraft principal axes of pitch, roll and yaw
+        radians using the aircraft principal axes of pitch, roll and yaw.
+        If the last reading is no more than *max_age* seconds old it is
+        returned without reading the IMU. If the IMU has no new reading
+        within *timeout* seconds (by default, three poll intervals) the last
+        orientation is returned
         """
 
-        raw = self._get_raw_data('fusionPoseValid', 'fusionPose')
+        return self._get_orientation_radians(None, max_age, timeout)
+
+    def _get_orientation_radians(self, config=None, max_age=0, timeout=None):
+        raw = self._get_raw_data(
+            'fusionPoseValid', 'fusionPose', config, max_age, timeout)
 
         if raw is not None:
             raw['roll'] = raw.pop('x')
@@ -756,39 +1284,43 @@ class SenseHat(object):
             raw['yaw'] = raw.pop('z')
             self._last_orientation = raw
 
-        return deepcopy(self._last_orientation)
+        return dict(self._last_orientation)
 
     @property
     def orientation_radians(self):
         return self.get_orientation_radians()
 
-    def get_orientation_degrees(self):
+    def get_orientation_degrees(self, max_age=0, timeout=None):
         """
         Returns a dictionary object to represent the current orientation
         in degrees, 0 to 360, using the aircraft principal axes of
-        pitch, roll and yaw
+        pitch, roll and yaw. See get_orientation_radians for *max_age* and
+        *timeout*
         """
 
-        orientation = self.get_orientation_radians()
+        return self._get_orientation_degrees(None, max_age, timeout)
+
+    def _get_orientation_degrees(self, config=None, max_age=0, timeout=None):
+        orientation = self._get_orientation_radians(config, max_age, timeout)
         for key, val in orientation.items():
             deg = math.degrees(val)  # Result is -180 to +180
             orientation[key] = deg + 360 if deg < 0 else deg
         return orientation
 
-    def get_orientation(self):
-        return self.get_orientation_degrees()
+    def get_orientation(self, max_age=0, timeout=None):
+        return self.get_orientation_degrees(max_age, timeout)
 
     @property
     def orientation(self):
         return self.get_orientation_degrees()
 
-    def get_compass(self):
+    def get_compass(self, max_age=0, timeout=None):
         """
         Gets the direction of North from the magnetometer in degrees
         """
 
-        self.set_imu_config(True, False, False)
-        orientation = self.get_orientation_degrees()
+        orientation = self._get_orientation_degrees(
+            (True, False, False), max_age, timeout)
         if type(orientation) is dict and 'yaw' in orientation.keys():
             return orientation['yaw']
         else:
@@ -798,29 +1330,30 @@ class SenseHat(object):
     def compass(self):
         return self.get_compass()
 
-    def get_compass_raw(self):
+    def get_compass_raw(self, max_age=0, timeout=None):
         """
         Magnetometer x y z raw data in uT (micro teslas)
         """
 
-        raw = self._get_raw_data('compassValid', 'compass')
+        raw = self._get_raw_data(
+            'compassValid', 'compass', None, max_age, timeout)
 
         if raw is not None:
             self._last_compass_raw = raw
 
-        return deepcopy(self._last_compass_raw)
+        return dict(self._last_compass_raw)
 
     @property
     def compass_raw(self):
         return self.get_compass_raw()
 
-    def get_gyroscope(self):
+    def get_gyroscope(self, max_age=0, timeout=None):
         """
         Gets the orientation in degrees from the gyroscope only
         """
 
-        self.set_imu_config(False, True, False)
-        return self.get_orientation_degrees()
+        return self._get_orientation_degrees(
+            (False, True, False), max_age, timeout)
 
     @property
     def gyro(self):
@@ -830,17 +1363,17 @@ class SenseHat(object):
     def gyroscope(self):
         return self.get_gyroscope()
 
-    def get_gyroscope_raw(self):
+    def get_gyroscope_raw(self, max_age=0, timeout=None):
         """
         Gyroscope x y z raw data in radians per second
         """
 
-        raw = self._get_raw_data('gyroValid', 'gyro')
+        raw = self._get_raw_data('gyroValid', 'gyro', None, max_age, timeout)
 
         if raw is not None:
             self._last_gyro_raw = raw
 
-        return deepcopy(self._last_gyro_raw)
+        return dict(self._last_gyro_raw)
 
     @property
     def gyro_raw(self):
@@ -850,13 +1383,13 @@ class SenseHat(object):
     def gyroscope_raw(self):
         return self.get_gyroscope_raw()
 
-    def get_accelerometer(self):
+    def get_accelerometer(self, max_age=0, timeout=None):
         """
         Gets the orientation in degrees from the accelerometer only
         """
 
-        self.set_imu_config(False, False, True)
-        return self.get_orientation_degrees()
+        return self._get_orientation_degrees(
+            (False, False, True), max_age, timeout)
 
     @property
     def accel(self):
@@ -866,17 +1399,18 @@ class SenseHat(object):
     def accelerometer(self):
         return self.get_accelerometer()
 
-    def get_accelerometer_raw(self):
+    def get_accelerometer_raw(self, max_age=0, timeout=None):
         """
         Accelerometer x y z raw data in Gs
         """
 
-        raw = self._get_raw_data('accelValid', 'accel')
+        raw = self._get_raw_data(
+            'accelValid', 'accel', None, max_age, timeout)
 
         if raw is not None:
             self._last_accel_raw = raw
 
-        return deepcopy(self._last_accel_raw)
+        return dict(self._last_accel_raw)
 
     @property
     def accel_raw(self):
@@ -0,0 +1,69 @@
+"""
+Coalescing of concurrent identical hardware reads.
+"""
+
+import time
+from threading import Event, Lock
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Ensures only one call for a given key is in progress at a time. Threads
+    which request a key while a call for it is already in progress wait for
+    that call to finish and share its result (or exception), so N threads
+    asking for the same sensor reading at once cause a single bus
+    transaction.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, timeout=None):
+        """
+        Calls *fn* with *args* unless a call for *key* is already in
+        progress, in which case its result is returned instead. If *timeout*
+        is given, waiting for another thread's call raises `TimeoutError`
+        after that many seconds.
+
+        A call which raises `TimeoutError` ran out of its own caller's time,
+        so threads waiting for it don't share that error: each makes a call
+        of its own instead, within its own *timeout*
+        """
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+            if leader:
+                break
+            remaining = None
+            if deadline is not None:
+                remaining = max(0, deadline - time.monotonic())
+            if not call.done.wait(remaining):
+                raise TimeoutError('Timed out waiting for %r' % (key,))
+            if isinstance(call.error, TimeoutError):
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn(*args)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
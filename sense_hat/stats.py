@@ -0,0 +1,112 @@
+"""
+Counters and latency histograms for Sense HAT hardware operations.
+
+Each hardware operation (a framebuffer write, an IMU read attempt, a colour
+block read, a joystick callback and so on) is timed and recorded here under
+its name. The hardware is shared by every object in the process (see
+`registry`), so the statistics are process-wide too. Recording an operation
+costs a lock and a bisection, which is small next to the I/O being timed.
+"""
+
+from bisect import bisect_left
+from threading import Lock
+
+
+# Upper bounds (in seconds) of the latency histogram buckets. Every
+# operation's histogram has one more bucket, for anything slower.
+BUCKETS = (
+    0.00001, 0.000025, 0.00005,
+    0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5,
+)
+
+_lock = Lock()
+_operations = {}
+
+
+class _Operation(object):
+    """
+    Internal. The statistics recorded for one operation
+    """
+
+    __slots__ = ('count', 'total', 'maximum', 'histogram', 'counters')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.histogram = [0] * (len(BUCKETS) + 1)
+        self.counters = {}
+
+    def snapshot(self):
+        buckets = list(BUCKETS) + [float('inf')]
+        result = {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'max': self.maximum,
+            'histogram': list(zip(buckets, self.histogram)),
+        }
+        result.update(self.counters)
+        return result
+
+
+def _operation(name):
+    operation = _operations.get(name)
+    if operation is None:
+        operation = _operations[name] = _Operation()
+    return operation
+
+
+def record(name, duration):
+    """
+    Records that the operation *name* took *duration* seconds
+    """
+
+    with _lock:
+        operation = _operation(name)
+        operation.count += 1
+        operation.total += duration
+        if duration > operation.maximum:
+            operation.maximum = duration
+        operation.histogram[bisect_left(BUCKETS, duration)] += 1
+
+
+def count(name, counter, n=1):
+    """
+    Adds *n* to the named *counter* of the operation *name*, for events
+    which aren't timed themselves (retries, failures and so on)
+    """
+
+    with _lock:
+        counters = _operation(name).counters
+        counters[counter] = counters.get(counter, 0) + n
+
+
+def snapshot(reset=False):
+    """
+    Returns a dictionary mapping each operation recorded so far to a
+    dictionary of its statistics: 'count', 'total', 'mean' and 'max' (in
+    seconds), 'histogram' (a list of (upper bound, count) tuples) and any
+    additional counters. If *reset* is True the statistics are cleared in
+    the same step, so no operation is missed or counted twice.
+    """
+
+    with _lock:
+        result = dict(
+            (name, operation.snapshot())
+            for name, operation in _operations.items())
+        if reset:
+            _operations.clear()
+    return result
+
+
+def reset():
+    """
+    Clears all recorded statistics
+    """
+
+    with _lock:
+        _operations.clear()
@@ -9,14 +9,18 @@ str = type('')
 
 import io
 import os
-import glob
+import time
 import errno
 import struct
 import select
-import inspect
+import weakref
 from functools import wraps
-from collections import namedtuple
-from threading import Thread, Event
+from collections import namedtuple, deque
+from threading import Thread, Lock, Condition, current_thread
+
+from . import discovery
+from . import registry
+from . import hooks
 
 
 DIRECTION_UP     = 'up'
@@ -29,13 +33,457 @@ ACTION_PRESSED  = 'pressed'
 ACTION_RELEASED = 'released'
 ACTION_HELD     = 'held'
 
+OVERFLOW_DROP_OLDEST = 'drop_oldest'
+OVERFLOW_DROP_NEWEST = 'drop_newest'
+OVERFLOW_COALESCE    = 'coalesce'
+
 
 InputEvent = namedtuple('InputEvent', ('timestamp', 'direction', 'action'))
 
 
+def wrap_callback(fn):
+    """
+    Returns *fn* adapted to be called with a single event parameter: *fn*
+    itself if it accepts one, otherwise a wrapper which calls it with no
+    parameters. Returns None if *fn* is None
+    """
+
+    # Shamelessley nicked (with some variation) from GPIO Zero :)
+    import inspect  # slow to import, and only needed here
+
+    @wraps(fn)
+    def wrapper(event):
+        return fn()
+
+    if fn is None:
+        return None
+    elif not callable(fn):
+        raise ValueError('value must be None or a callable')
+    elif inspect.isbuiltin(fn):
+        # We can't introspect the prototype of builtins. In this case we
+        # assume that the builtin has no (mandatory) parameters; this is
+        # the most reasonable assumption on the basis that pre-existing
+        # builtins have no knowledge of InputEvent, and the sole parameter
+        # we would pass is an InputEvent
+        return wrapper
+    else:
+        # Try binding ourselves to the argspec of the provided callable.
+        # If this works, assume the function is capable of accepting no
+        # parameters and that we have to wrap it to ignore the event
+        # parameter
+        try:
+            inspect.getcallargs(fn)
+            return wrapper
+        except TypeError:
+            try:
+                # If the above fails, try binding with a single tuple
+                # parameter. If this works, return the callback as is
+                inspect.getcallargs(fn, ())
+                return fn
+            except TypeError:
+                raise ValueError(
+                    'value must be a callable which accepts up to one '
+                    'mandatory parameter')
+
+
+class _OrderedDispatcher(object):
+    """
+    Internal. Runs jobs on *executor*, running jobs submitted with the same
+    key one at a time in the order they were submitted. Jobs with different
+    keys may run concurrently
+    """
+
+    def __init__(self, executor):
+        self.executor = executor
+        self._lock = Lock()
+        # Jobs waiting for each key which has a job running
+        self._queues = {}
+
+    def submit(self, key, fn, *args):
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is not None:
+                queue.append((fn, args))
+                return
+            self._queues[key] = deque([(fn, args)])
+        self.executor.submit(self._drain, key)
+
+    def _drain(self, key):
+        while True:
+            with self._lock:
+                queue = self._queues[key]
+                if not queue:
+                    del self._queues[key]
+                    return
+                fn, args = queue.popleft()
+            try:
+                fn(*args)
+            except Exception:
+                import logging  # only needed if a callback fails
+
+                logging.exception('Joystick callback failed')
+
+
+class Subscription(object):
+    """
+    A queue of the events read from a `SenseStick`, returned by
+    `SenseStick.subscribe`. Every subscription receives every event read
+    while it is open, so consumers don't take events from one another.
+
+    The queue holds at most *maxlen* events. When it is full, *overflow*
+    decides what is lost: `OVERFLOW_DROP_OLDEST` drops the oldest queued
+    event, `OVERFLOW_DROP_NEWEST` drops the new event, and
+    `OVERFLOW_COALESCE` replaces a queued "held" event with a new "held"
+    event of the same direction (even before the queue is full), dropping
+    the oldest event if that doesn't make room.
+    """
+
+    def __init__(self, reader, maxlen, overflow):
+        if maxlen < 1:
+            raise ValueError('maxlen must be at least 1')
+        if overflow not in (
+                OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST, OVERFLOW_COALESCE):
+            raise ValueError('Unknown overflow policy %r' % overflow)
+        self.maxlen = maxlen
+        self.overflow = overflow
+        self._reader = reader
+        self._queue = deque()
+        self._dropped = 0
+        self._closed = False
+        self._async_waiters = []
+        # Called (with the lock held) whenever events are queued
+        self._notify = None
+
+    def close(self):
+        """
+        Stops queueing events and wakes anything waiting for one
+        """
+
+        self._reader._unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.close()
+
+    @property
+    def dropped(self):
+        """
+        The number of events dropped or coalesced because the queue was full
+        """
+
+        return self._dropped
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def __len__(self):
+        return len(self._queue)
+
+    def _put(self, events):
+        """
+        Internal. Queues *events*, applying the overflow policy. Called with
+        the reader's lock held
+        """
+
+        queue = self._queue
+        for event in events:
+            if (self.overflow == OVERFLOW_COALESCE and
+                    event.action == ACTION_HELD and queue and
+                    queue[-1].action == ACTION_HELD and
+                    queue[-1].direction == event.direction):
+                queue[-1] = event
+                self._dropped += 1
+                continue
+            if len(queue) >= self.maxlen:
+                self._dropped += 1
+                if self.overflow == OVERFLOW_DROP_NEWEST:
+                    continue
+                queue.popleft()
+            queue.append(event)
+        if queue:
+            self._wake()
+            if self._notify is not None:
+                self._notify()
+
+    def _wake(self):
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_complete, future)
+
+    def get_events(self):
+        """
+        Returns a list of the queued events, after queueing those available
+        from the joystick, and empties the queue
+        """
+
+        self._reader._poll()
+        with self._reader._changed:
+            result = list(self._queue)
+            self._queue.clear()
+        return result
+
+    def wait_for_event(self, timeout=None):
+        """
+        Returns the next event, waiting up to *timeout* seconds (forever if
+        it is `None`) for one. Returns `None` if the timeout expires or the
+        subscription is closed
+        """
+
+        reader = self._reader
+        with reader._changed:
+            if reader._wait_for(self, timeout):
+                return self._queue.popleft()
+        return None
+
+    async def async_wait_for_event(self):
+        """
+        Returns the next event, waiting without blocking the running asyncio
+        event loop. Returns `None` if the subscription is closed
+        """
+
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        reader = self._reader
+        while True:
+            with reader._changed:
+                if self._closed:
+                    return None
+                if self._queue:
+                    return self._queue.popleft()
+                future = loop.create_future()
+                waiter = (loop, future)
+                self._async_waiters.append(waiter)
+            reader._watch(loop)
+            try:
+                await future
+            finally:
+                reader._unwatch(loop)
+                with reader._changed:
+                    if waiter in self._async_waiters:
+                        self._async_waiters.remove(waiter)
+
+    async def events(self):
+        """
+        An asynchronous iterator of the subscription's events, which ends
+        when the subscription is closed
+        """
+
+        while True:
+            event = await self.async_wait_for_event()
+            if event is None:
+                return
+            yield event
+
+
+def _close_fds(fds):
+    for fd in fds:
+        os.close(fd)
+
+
+def _complete(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class _StickReader(object):
+    """
+    Internal. Reads the events of one joystick device and fans them out to
+    every `Subscription`. There is one reader per device in the process,
+    shared by every `SenseStick` using the device, so each stick sees every
+    event. Only *stick_file* is used to read the device, and it is closed
+    with the reader if *owned*
+    """
+
+    def __init__(self, stick_file, name, stick_class, owned=True):
+        self.file = stick_file
+        self.name = name
+        self._owned = owned
+        self._format = stick_class.EVENT_FORMAT
+        self._event_size = stick_class.EVENT_SIZE
+        self._read_size = stick_class.EVENT_SIZE * stick_class.READ_EVENTS
+        self._ev_key = stick_class.EV_KEY
+        self._partial = b''
+        self._closed = False
+        # Only one thread reads the device at a time (while _reading is
+        # set), and fans the events out to every subscription. The pipe
+        # interrupts it when a subscription it may be reading for closes
+        self._changed = Condition()
+        self._subscriptions = []
+        self._reading = False
+        self._interrupt_pipe = os.pipe()
+        self._close_pipe = weakref.finalize(
+            self, _close_fds, self._interrupt_pipe)
+        self._async_loops = {}
+
+    def close(self):
+        with self._changed:
+            if self._closed:
+                return
+            self._closed = True
+            for subscription in list(self._subscriptions):
+                self._unsubscribe(subscription)
+            # Closing the subscriptions interrupts a thread reading for one,
+            # but it may still be selecting on the pipe and the file
+            while self._reading:
+                self._changed.wait()
+        self._close_pipe()
+        if self._owned:
+            self.file.close()
+
+    def _read(self):
+        """
+        Reads all the events available from the joystick with a single
+        system call, blocking until at least one is available. Returns a
+        tuple of (events, more): a list of `InputEvent` tuples for the key
+        events read, which may be empty, and whether further events may
+        already be waiting because the read filled its buffer.
+        """
+        size = self._read_size
+        data = self.file.read(size)
+        if not data:
+            raise EOFError('joystick device %s was closed' % self.name)
+        more = len(data) == size
+        if self._partial:
+            data = self._partial + data
+        # The evdev device only returns whole events, but other sources
+        # may split them
+        whole = len(data) - len(data) % self._event_size
+        self._partial = data[whole:]
+        events = [
+            InputEvent(tv_sec + (tv_usec / 1000000), _DIRECTIONS[code],
+                       _ACTIONS[value])
+            for (tv_sec, tv_usec, type, code, value)
+            in struct.iter_unpack(self._format, data[:whole])
+            if type == self._ev_key
+        ]
+        return events, more
+
+    def _wait(self, timeout=None):
+        """
+        Waits *timeout* seconds until an event is available from the
+        joystick. Returns `True` if an event became available, and `False`
+        if the timeout expired.
+        """
+        r, w, x = select.select([self.file], [], [], timeout)
+        return bool(r)
+
+    def subscribe(self, maxlen, overflow):
+        subscription = Subscription(self, maxlen, overflow)
+        with self._changed:
+            if self._closed:
+                subscription._closed = True
+            else:
+                self._subscriptions.append(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._changed:
+            if subscription._closed:
+                return
+            subscription._closed = True
+            self._subscriptions.remove(subscription)
+            subscription._wake()
+            self._changed.notify_all()
+            if self._reading:
+                os.write(self._interrupt_pipe[1], b'\0')
+
+    def _distribute(self, events):
+        """
+        Internal. Queues *events* on every subscription. Called with the
+        lock held
+        """
+        if events:
+            for subscription in self._subscriptions:
+                subscription._put(events)
+
+    def _wait_for(self, subscription, timeout=None):
+        """
+        Internal. Waits up to *timeout* seconds until *subscription* has an
+        event queued, reading the device unless another thread is. Returns
+        `False` if the timeout expires or the subscription is closed. Called
+        with the lock held
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        interrupt = self._interrupt_pipe[0]
+        while not subscription._closed:
+            if subscription._queue:
+                return True
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+            if self._reading:
+                self._changed.wait(remaining)
+                continue
+            self._reading = True
+            events = None
+            self._changed.release()
+            try:
+                r, w, x = select.select(
+                    [self.file, interrupt], [], [], remaining)
+                if interrupt in r:
+                    os.read(interrupt, 64)
+                if self.file in r:
+                    events = self._read()[0]
+            finally:
+                self._changed.acquire()
+                self._reading = False
+                self._distribute(events)
+                self._changed.notify_all()
+        return False
+
+    def _poll(self):
+        """
+        Internal. Reads and fans out the events available from the device
+        without blocking, unless another thread is reading it
+        """
+        with self._changed:
+            if self._reading or self._closed:
+                return
+            self._reading = True
+        events = []
+        try:
+            while self._wait(0):
+                batch, more = self._read()
+                events.extend(batch)
+                if not more:
+                    break
+        finally:
+            with self._changed:
+                self._reading = False
+                self._distribute(events)
+                self._changed.notify_all()
+
+    def _watch(self, loop):
+        """
+        Internal. Has *loop* read the device when it becomes readable, until
+        `_unwatch` has been called as many times as `_watch`
+        """
+        count = self._async_loops.get(loop, 0)
+        if not count:
+            loop.add_reader(self.file.fileno(), self._poll)
+        self._async_loops[loop] = count + 1
+
+    def _unwatch(self, loop):
+        count = self._async_loops.pop(loop) - 1
+        if count:
+            self._async_loops[loop] = count
+        else:
+            loop.remove_reader(self.file.fileno())
+
+
 class SenseStick(object):
     """
     Represents the joystick on the Sense HAT.
+
+    Events are read from the joystick's evdev device unless another
+    *source* of ``input_event`` records is given: an object with `fileno`
+    and `read` methods (such as `FakeStickDevice`) and optionally a `name`.
     """
     SENSE_HAT_EVDEV_NAME = 'Raspberry Pi Sense HAT Joystick'
     EVENT_FORMAT = native_str('llHHI')
@@ -53,18 +501,44 @@ class SenseStick(object):
     KEY_DOWN = 108
     KEY_ENTER = 28
 
-    def __init__(self):
-        self._stick_file = io.open(self._stick_device(), 'rb', buffering=0)
+    # The most events read from the device with a single system call
+    READ_EVENTS = 64
+    # The size of the queue behind get_events and wait_for_event
+    QUEUE_SIZE = 256
+
+    def __init__(self, source=None):
+        if source is None:
+            # Every SenseStick in the process shares one reader for the
+            # device, and has its own subscriptions to it
+            self._device = self._stick_device()
+            key = ('stick', self._device)
+            self._reader = registry.acquire(
+                key, lambda: _StickReader(
+                    io.open(key[1], 'rb', buffering=0), key[1], type(self)),
+                _StickReader.close)
+            self._release = weakref.finalize(self, registry.release, key)
+        else:
+            # The caller owns the source, and closes it
+            self._device = getattr(source, 'name', 'stick')
+            self._reader = _StickReader(
+                source, self._device, type(self), owned=False)
+            self._release = weakref.finalize(self, self._reader.close)
+        self._subscriptions = weakref.WeakSet()
         self._callbacks = {}
         self._callback_thread = None
-        self._callback_event = Event()
+        self._callback_subscription = None
+        self._external_dispatch = False
+        self._dispatcher = None
+        self._default = self.subscribe(self.QUEUE_SIZE)
 
     def close(self):
-        if self._stick_file:
+        if self._reader is not None:
             self._callbacks.clear()
             self._start_stop_thread()
-            self._stick_file.close()
-            self._stick_file = None
+            for subscription in list(self._subscriptions):
+                subscription.close()
+            self._release()
+            self._reader = None
 
     def __enter__(self):
         return self
@@ -75,8 +549,30 @@ class SenseStick(object):
     def _stick_device(self):
         """
         Discovers the filename of the evdev device that represents the Sense
-        HAT's joystick.
+        HAT's joystick. The result is cached until the next reboot.
+        """
+        device = discovery.lookup(
+            'stick', self._find_stick_device, self._is_stick_device)
+        if device is None:
+            raise RuntimeError('unable to locate SenseHAT joystick device')
+        return device
+
+    def _is_stick_device(self, device):
+        """
+        Returns `True` if *device* is the evdev device of the Sense HAT's
+        joystick.
+        """
+        name = discovery.read_name(os.path.join(
+            '/sys/class/input', os.path.basename(device), 'device', 'name'))
+        return name == self.SENSE_HAT_EVDEV_NAME and os.path.exists(device)
+
+    def _find_stick_device(self):
         """
+        Searches sysfs for the evdev device of the Sense HAT's joystick,
+        returning `None` if it cannot be found.
+        """
+        import glob
+
         for evdev in glob.glob('/sys/class/input/event*'):
             try:
                 with io.open(os.path.join(evdev, 'device', 'name'), 'r') as f:
@@ -85,100 +581,94 @@ class SenseStick(object):
             except IOError as e:
                 if e.errno != errno.ENOENT:
                     raise
-        raise RuntimeError('unable to locate SenseHAT joystick device')
+        return None
 
-    def _read(self):
+    _wrap_callback = staticmethod(wrap_callback)
+
+    @property
+    def callback_executor(self):
         """
-        Reads a single event from the joystick, blocking until one is
-        available. Returns `None` if a non-key event was read, or an
-        `InputEvent` tuple describing the event otherwise.
-        """
-        event = self._stick_file.read(self.EVENT_SIZE)
-        (tv_sec, tv_usec, type, code, value) = struct.unpack(self.EVENT_FORMAT, event)
-        if type == self.EV_KEY:
-            return InputEvent(
-                timestamp=tv_sec + (tv_usec / 1000000),
-                direction={
-                    self.KEY_UP:    DIRECTION_UP,
-                    self.KEY_DOWN:  DIRECTION_DOWN,
-                    self.KEY_LEFT:  DIRECTION_LEFT,
-                    self.KEY_RIGHT: DIRECTION_RIGHT,
-                    self.KEY_ENTER: DIRECTION_MIDDLE,
-                    }[code],
-                action={
-                    self.STATE_PRESS:   ACTION_PRESSED,
-                    self.STATE_RELEASE: ACTION_RELEASED,
-                    self.STATE_HOLD:    ACTION_HELD,
-                    }[value])
-        else:
+        The `concurrent.futures.Executor` which runs the `direction_*`
+        callbacks, or `None` (the default) to run them in the joystick's
+        callback thread.
+
+        With an executor, the callbacks for events in one direction run one
+        at a time in the order the events occurred (and `direction_any` runs
+        after the direction's own callback), but callbacks for different
+        directions may run concurrently, so a slow callback doesn't delay
+        the others. Exceptions raised by callbacks are logged.
+        """
+        if self._dispatcher is None:
             return None
+        return self._dispatcher.executor
 
-    def _wait(self, timeout=None):
+    @callback_executor.setter
+    def callback_executor(self, value):
+        if value is None:
+            self._dispatcher = None
+        else:
+            self._dispatcher = _OrderedDispatcher(value)
+
+    def subscribe(self, maxlen=64, overflow=OVERFLOW_DROP_OLDEST):
         """
-        Waits *timeout* seconds until an event is available from the
-        joystick. Returns `True` if an event became available, and `False`
-        if the timeout expired.
+        Returns a new `Subscription`, which queues every event read from now
+        on, up to *maxlen* events, with the *overflow* policy
         """
-        r, w, x = select.select([self._stick_file], [], [], timeout)
-        return bool(r)
+        subscription = self._reader.subscribe(maxlen, overflow)
+        self._subscriptions.add(subscription)
+        return subscription
 
-    def _wrap_callback(self, fn):
-        # Shamelessley nicked (with some variation) from GPIO Zero :)
-        @wraps(fn)
-        def wrapper(event):
-            return fn()
-
-        if fn is None:
-            return None
-        elif not callable(fn):
-            raise ValueError('value must be None or a callable')
-        elif inspect.isbuiltin(fn):
-            # We can't introspect the prototype of builtins. In this case we
-            # assume that the builtin has no (mandatory) parameters; this is
-            # the most reasonable assumption on the basis that pre-existing
-            # builtins have no knowledge of InputEvent, and the sole parameter
-            # we would pass is an InputEvent
-            return wrapper
-        else:
-            # Try binding ourselves to the argspec of the provided callable.
-            # If this works, assume the function is capable of accepting no
-            # parameters and that we have to wrap it to ignore the event
-            # parameter
-            try:
-                inspect.getcallargs(fn)
-                return wrapper
-            except TypeError:
-                try:
-                    # If the above fails, try binding with a single tuple
-                    # parameter. If this works, return the callback as is
-                    inspect.getcallargs(fn, ())
-                    return fn
-                except TypeError:
-                    raise ValueError(
-                        'value must be a callable which accepts up to one '
-                        'mandatory parameter')
+    def _set_external_dispatch(self, external):
+        """
+        Internal. Stops (or restarts) the callback thread while something
+        else, such as an `EventLoop`, calls `_dispatch_event` instead
+        """
+        self._external_dispatch = external
+        self._start_stop_thread()
 
     def _start_stop_thread(self):
-        if self._callbacks and not self._callback_thread:
-            self._callback_event.clear()
-            self._callback_thread = Thread(target=self._callback_run)
+        running = (
+            any(self._callbacks.values()) and not self._external_dispatch)
+        if running and not self._callback_thread:
+            self._callback_subscription = self.subscribe(self.QUEUE_SIZE)
+            self._callback_thread = Thread(
+                target=self._callback_run,
+                args=(self._callback_subscription,))
             self._callback_thread.daemon = True
             self._callback_thread.start()
-        elif not self._callbacks and self._callback_thread:
-            self._callback_event.set()
-            self._callback_thread.join()
+        elif not running and self._callback_thread:
+            # Closing the subscription stops the thread immediately, even if
+            # it is waiting for an event. A callback may be stopping its own
+            # thread, which cannot be joined
+            self._callback_subscription.close()
+            if self._callback_thread is not current_thread():
+                self._callback_thread.join()
             self._callback_thread = None
-
-    def _callback_run(self):
-        while not self._callback_event.wait(0):
-            event = self._read()
-            if event:
-                callback = self._callbacks.get(event.direction)
-                if callback:
-                    callback(event)
-                callback = self._callbacks.get('*')
-                if callback:
-                    callback(event)
+            self._callback_subscription = None
+
+    def _callback_run(self, subscription):
+        while True:
+            event = subscription.wait_for_event()
+            if event is None:
+                return
+            self._dispatch_event(event)
+
+    def _dispatch_event(self, event):
+        dispatcher = self._dispatcher
+        if dispatcher is None:
+            self._dispatch(event)
+        else:
+            dispatcher.submit(event.direction, self._dispatch, event)
+
+    def _dispatch(self, event):
+        start = hooks.begin('stick_dispatch', self._device)
+        callback = self._callbacks.get(event.direction)
+        if callback:
+            callback(event)
+        callback = self._callbacks.get('*')
+        if callback:
+            callback(event)
+        hooks.end('stick_dispatch', self._device, None, start)
 
     def wait_for_event(self, emptybuffer=False):
         """
@@ -190,12 +680,28 @@ class SenseStick(object):
         interested in "pressed" events.
         """
         if emptybuffer:
-            while self._wait(0):
-                self._read()
-        while self._wait():
-            event = self._read()
-            if event:
-                return event
+            self._default.get_events()
+        return self._default.wait_for_event()
+
+    async def async_wait_for_event(self, emptybuffer=False):
+        """
+        Waits until a joystick event becomes available without blocking the
+        running asyncio event loop. Returns the event, as an `InputEvent`
+        tuple. *emptybuffer* is as for `wait_for_event`.
+        """
+        if emptybuffer:
+            self._default.get_events()
+        return await self._default.async_wait_for_event()
+
+    async def events(self, maxlen=64, overflow=OVERFLOW_DROP_OLDEST):
+        """
+        An asynchronous iterator of joystick events, for use with
+        ``async for`` in an asyncio event loop. Each iterator has its own
+        `Subscription`, with *maxlen* and *overflow* as for `subscribe`.
+        """
+        with self.subscribe(maxlen, overflow) as subscription:
+            async for event in subscription.events():
+                yield event
 
     def get_events(self):
         """
@@ -204,12 +710,7 @@ class SenseStick(object):
         occurred. If no events have occurred in the intervening time, the
         result is an empty list.
         """
-        result = []
-        while self._wait(0):
-            event = self._read()
-            if event:
-                result.append(event)
-        return result
+        return self._default.get_events()
 
     @property
     def direction_up(self):
@@ -306,3 +807,95 @@ class SenseStick(object):
         self._callbacks['*'] = self._wrap_callback(value)
         self._start_stop_thread()
 
+
+
+class FakeStickDevice(object):
+    """
+    A stand-in for the joystick's evdev device, for testing and benchmarking
+    without a Sense HAT. Pass it to `SenseStick` as the *source*, then
+    inject events, which the stick reads exactly as it would read events
+    from the joystick:
+
+        device = FakeStickDevice()
+        stick = SenseStick(source=device)
+        device.inject(DIRECTION_UP, ACTION_PRESSED)
+        stick.wait_for_event()
+
+    The events pass through a socket pair, so the stick can wait for them
+    with select or an asyncio event loop.
+    """
+
+    name = 'fake'
+
+    def __init__(self):
+        import socket
+
+        self._reader, self._writer = socket.socketpair()
+
+    def close(self):
+        self._reader.close()
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.close()
+
+    def fileno(self):
+        return self._reader.fileno()
+
+    def read(self, size):
+        return self._reader.recv(size)
+
+    def inject(self, direction, action, timestamp=None):
+        """
+        Sends a single joystick event which occurred at *timestamp* (by
+        default, now)
+        """
+
+        if timestamp is None:
+            timestamp = time.time()
+        self.inject_events([InputEvent(timestamp, direction, action)])
+
+    def inject_events(self, events):
+        """
+        Sends *events*, a sequence of `InputEvent` tuples, with one write.
+        Like the kernel, each key event is followed by a synchronisation
+        event
+        """
+
+        pack = struct.Struct(SenseStick.EVENT_FORMAT).pack
+        records = []
+        for timestamp, direction, action in events:
+            sec = int(timestamp)
+            usec = int(round((timestamp - sec) * 1000000))
+            records.append(pack(
+                sec, usec, SenseStick.EV_KEY, _KEYS[direction],
+                _STATES[action]))
+            records.append(pack(sec, usec, 0, 0, 0))
+        self.inject_raw(b''.join(records))
+
+    def inject_raw(self, data):
+        """
+        Sends *data*, which should be ``input_event`` records, unchanged
+        """
+
+        self._writer.sendall(data)
+
+
+# Translations of evdev key codes and values, for decoding events
+_DIRECTIONS = {
+    SenseStick.KEY_UP:    DIRECTION_UP,
+    SenseStick.KEY_DOWN:  DIRECTION_DOWN,
+    SenseStick.KEY_LEFT:  DIRECTION_LEFT,
+    SenseStick.KEY_RIGHT: DIRECTION_RIGHT,
+    SenseStick.KEY_ENTER: DIRECTION_MIDDLE,
+    }
+_ACTIONS = {
+    SenseStick.STATE_PRESS:   ACTION_PRESSED,
+    SenseStick.STATE_RELEASE: ACTION_RELEASED,
+    SenseStick.STATE_HOLD:    ACTION_HELD,
+    }
+_KEYS = {direction: code for code, direction in _DIRECTIONS.items()}
+_STATES = {action: value for value, action in _ACTIONS.items()}
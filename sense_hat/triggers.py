@@ -0,0 +1,278 @@
+"""
+Conditions on sensor readings, evaluated as they are sampled.
+
+A `Trigger` watches one field of a `Sampler`'s rows for a condition, and
+calls its `when_activated` and `when_deactivated` callbacks only when the
+condition starts and stops holding:
+
+    from sense_hat import SenseHat
+    from sense_hat.sampler import Sampler
+    from sense_hat.triggers import Trigger, Above, Falling
+
+    sense = SenseHat()
+    humid = Trigger(Above('humidity', 70, hysteresis=5))
+    humid.when_activated = lambda: print('Humid!')
+    storm = Trigger(Falling('pressure', 0.5 / 3600, window=600))
+    storm.when_activated = lambda event: print('Pressure falling', event)
+
+    with Sampler(sense) as sampler:
+        sampler.add_trigger(humid)
+        sampler.add_trigger(storm)
+        ...
+
+Conditions are evaluated incrementally, one reading at a time, in the
+sampling thread. Orientation fields ('roll', 'pitch' and 'yaw') are in
+radians.
+"""
+
+from collections import deque, namedtuple
+
+from .sampler import FIELDS
+from .stick import wrap_callback
+
+
+TriggerEvent = namedtuple(
+    'TriggerEvent', ('timestamp', 'trigger', 'active', 'value'))
+
+
+class Condition(object):
+    """
+    Base class of conditions on the values of *field*. Subclasses implement
+    `evaluate`
+    """
+
+    def __init__(self, field):
+        if field not in FIELDS:
+            raise ValueError('Unknown field %r' % field)
+        self.field = field
+
+    def evaluate(self, timestamp, value, active):
+        """
+        Returns a tuple of (holds, value) for a new *value* of the field
+        read at *timestamp*. *active* is whether the condition held
+        previously, so subclasses can apply hysteresis. The returned value
+        is passed on in `TriggerEvent`
+        """
+
+        raise NotImplementedError
+
+    def reset(self):
+        """
+        Forgets any readings the condition has accumulated
+        """
+
+        pass
+
+
+class Above(Condition):
+    """
+    Holds while *field* is above *level*. Once holding, it continues to hold
+    until the field falls to *level* - *hysteresis*
+    """
+
+    def __init__(self, field, level, hysteresis=0):
+        super(Above, self).__init__(field)
+        self.level = level
+        self.hysteresis = hysteresis
+
+    def evaluate(self, timestamp, value, active):
+        if active:
+            return value > self.level - self.hysteresis, value
+        return value > self.level, value
+
+
+class Below(Condition):
+    """
+    Holds while *field* is below *level*. Once holding, it continues to hold
+    until the field rises to *level* + *hysteresis*
+    """
+
+    def __init__(self, field, level, hysteresis=0):
+        super(Below, self).__init__(field)
+        self.level = level
+        self.hysteresis = hysteresis
+
+    def evaluate(self, timestamp, value, active):
+        if active:
+            return value < self.level + self.hysteresis, value
+        return value < self.level, value
+
+
+class Outside(Condition):
+    """
+    Holds while *field* is below *low* or above *high*. Once holding, it
+    continues to hold until the field is *hysteresis* inside the limits
+    """
+
+    def __init__(self, field, low, high, hysteresis=0):
+        super(Outside, self).__init__(field)
+        if low > high:
+            raise ValueError('low must not be greater than high')
+        self.low = low
+        self.high = high
+        self.hysteresis = hysteresis
+
+    def evaluate(self, timestamp, value, active):
+        margin = self.hysteresis if active else 0
+        return (
+            value < self.low + margin or value > self.high - margin), value
+
+
+class _Rate(Condition):
+    """
+    Internal. Base class of conditions on the rate of change per second of
+    *field*, measured over the last *window* seconds
+    """
+
+    def __init__(self, field, rate, window=1.0, hysteresis=0):
+        super(_Rate, self).__init__(field)
+        if window <= 0:
+            raise ValueError('window must be positive')
+        self.rate = rate
+        self.window = window
+        self.hysteresis = hysteresis
+        self._history = deque()
+
+    def reset(self):
+        self._history.clear()
+
+    def _rate(self, timestamp, value):
+        """
+        Internal. Returns the rate of change over the window ending with
+        *value*, or None until a whole window has been seen
+        """
+
+        history = self._history
+        history.append((timestamp, value))
+        while len(history) > 2 and timestamp - history[1][0] >= self.window:
+            history.popleft()
+        start, start_value = history[0]
+        if timestamp - start < self.window:
+            return None
+        return (value - start_value) / (timestamp - start)
+
+
+class Rising(_Rate):
+    """
+    Holds while *field* is rising faster than *rate* per second, measured
+    over the last *window* seconds
+    """
+
+    def evaluate(self, timestamp, value, active):
+        rate = self._rate(timestamp, value)
+        if rate is None:
+            return False, rate
+        if active:
+            return rate > self.rate - self.hysteresis, rate
+        return rate > self.rate, rate
+
+
+class Falling(_Rate):
+    """
+    Holds while *field* is falling faster than *rate* per second, measured
+    over the last *window* seconds
+    """
+
+    def evaluate(self, timestamp, value, active):
+        rate = self._rate(timestamp, value)
+        if rate is None:
+            return False, rate
+        if active:
+            return -rate > self.rate - self.hysteresis, rate
+        return -rate > self.rate, rate
+
+
+class Trigger(object):
+    """
+    Activates when *condition* has held continuously for *duration*
+    seconds, and deactivates as soon as it stops holding. The callbacks
+    `when_activated` and `when_deactivated` are called on each transition,
+    either with no parameters or with a `TriggerEvent`.
+    """
+
+    def __init__(
+            self, condition, duration=0, when_activated=None,
+            when_deactivated=None):
+        self.condition = condition
+        self.duration = duration
+        self.when_activated = when_activated
+        self.when_deactivated = when_deactivated
+        self._active = False
+        self._holds = False
+        self._since = None
+
+    @property
+    def stream(self):
+        """
+        The name of the stream containing the condition's field
+        """
+
+        return FIELDS[self.condition.field]
+
+    @property
+    def active(self):
+        """
+        Returns True while the trigger is active
+        """
+
+        return self._active
+
+    @property
+    def when_activated(self):
+        """
+        The function to call when the trigger activates
+        """
+
+        return self._when_activated
+
+    @when_activated.setter
+    def when_activated(self, value):
+        self._when_activated = wrap_callback(value)
+
+    @property
+    def when_deactivated(self):
+        """
+        The function to call when the trigger deactivates
+        """
+
+        return self._when_deactivated
+
+    @when_deactivated.setter
+    def when_deactivated(self, value):
+        self._when_deactivated = wrap_callback(value)
+
+    def reset(self):
+        """
+        Deactivates the trigger without calling `when_deactivated`, and
+        forgets the condition's history
+        """
+
+        self._active = self._holds = False
+        self._since = None
+        self.condition.reset()
+
+    def update(self, row):
+        """
+        Evaluates the trigger against a new *row* of readings, as produced
+        by `Sampler`
+        """
+
+        timestamp = row['timestamp']
+        holds, value = self.condition.evaluate(
+            timestamp, row[self.condition.field], self._holds)
+        self._holds = holds
+        if holds:
+            if self._since is None:
+                self._since = timestamp
+            if not self._active and timestamp - self._since >= self.duration:
+                self._active = True
+                callback = self._when_activated
+                if callback:
+                    callback(TriggerEvent(timestamp, self, True, value))
+        else:
+            self._since = None
+            if self._active:
+                self._active = False
+                callback = self._when_deactivated
+                if callback:
+                    callback(TriggerEvent(timestamp, self, False, value))